@@ -0,0 +1,125 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Measure peak memory of RenameItems on a large folder.
+
+Fill a synthetic folder and run RenameItems on it in a fresh process,
+reporting peak RSS growth per million files. With --against, an older
+revision of the scripts, taken from git, runs on an identical folder too.
+
+    python3 benchmark/rename_memory.py --files 1000000 --against <revision>
+"""
+import argparse
+import contextlib
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT: Path = Path(__file__).resolve().parents[1]
+
+
+def parse_command_line_arguments() -> argparse.Namespace:
+    """Read benchmark options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", help="Files in folder", type=int, default=200_000)
+    parser.add_argument("--path", help="Where to create folders", type=str, default=None)
+    parser.add_argument(
+        "--against", help="Git revision to compare with", type=str, default=None
+    )
+    parser.add_argument("--scripts", help=argparse.SUPPRESS, type=str)
+    parser.add_argument("--folder", help=argparse.SUPPRESS, type=str)
+    return parser.parse_args()
+
+
+def fill_folder(folder: Path, files: int) -> None:
+    """Create empty files with names like the ones phones write.
+
+    Args:
+        folder (Path): folder to create
+        files (int): number of files
+    """
+    folder.mkdir()
+    for name in range(files):
+        os.close(os.open(folder / f"IMG-20230912-WA{name:08}.jpg", os.O_CREAT, 0o644))
+
+
+def export_revision(revision: str, base: str) -> str:
+    """Copy scripts folder as it was at a git revision.
+
+    Args:
+        revision (str): any git revision
+        base (str): empty folder
+
+    Returns:
+        str: scripts folder of that revision
+    """
+    archive = subprocess.run(
+        ["git", "-C", str(ROOT), "archive", revision, "helpful_cakes"],
+        check=True,
+        capture_output=True,
+    )
+    subprocess.run(["tar", "-x", "-C", base], input=archive.stdout, check=True)
+    return str(Path(base, "helpful_cakes"))
+
+
+def measure(scripts: str, folder: str) -> float:
+    """Run RenameItems from a scripts folder in a fresh process.
+
+    Args:
+        scripts (str): folder with rename_items.py
+        folder (str): synthetic folder
+
+    Returns:
+        float: peak RSS growth, in megabytes
+    """
+    command: list[str] = [sys.executable, __file__, "--scripts", scripts]
+    output = subprocess.run(
+        command + ["--folder", folder], check=True, capture_output=True, text=True
+    )
+    return float(output.stdout)
+
+
+def rename(scripts: str, folder: str) -> float:
+    """Rename every file in folder, output discarded, and return RSS growth.
+
+    Args:
+        scripts (str): folder with rename_items.py
+        folder (str): synthetic folder
+
+    Returns:
+        float: peak RSS growth, in megabytes
+    """
+    sys.path.insert(0, scripts)
+    from rename_items import Constant, FileStart, RenameItems
+
+    before: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        repr(RenameItems(Constant(), FileStart, folder))  # type: ignore
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+
+
+def main() -> None:
+    """Run current scripts, and the older revision if any, and print a summary."""
+    arguments = parse_command_line_arguments()
+    if arguments.scripts:
+        print(rename(arguments.scripts, arguments.folder))
+        return
+    versions: dict[str, str] = {"current": str(ROOT / "helpful_cakes")}
+    results: dict[str, float] = {}
+    with tempfile.TemporaryDirectory(dir=arguments.path) as base:
+        if arguments.against:
+            versions[arguments.against] = export_revision(arguments.against, base)
+        for number, (version, scripts) in enumerate(versions.items()):
+            folder: Path = Path(base, f"folder{number}")
+            fill_folder(folder, arguments.files)
+            results[version] = measure(scripts, str(folder))
+    million: float = 1_000_000 / arguments.files
+    print(f"{arguments.files} files at {arguments.path or tempfile.gettempdir()}")
+    for version, megabytes in results.items():
+        print(f"{version:>10}: {megabytes:8.1f} MB  {megabytes * million:8.1f} MB/million")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Compare rename time in listing order against inode order.
+
+Fill a synthetic folder, then run RenameItems once per order on an identical
+copy of it. Point --path to the disk you want to measure, and use
+--drop-caches (root only) so inode tables are read from disk on each run.
+
+    python3 benchmark/rename_order.py --files 200000 --path /mnt/ext4
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "helpful_cakes"))
+
+from rename_items import Constant, FileStart, RenameItems  # noqa: E402
+from utils.schedule import ORDERS  # noqa: E402
+
+
+def parse_command_line_arguments() -> argparse.Namespace:
+    """Read benchmark options."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", help="Files per folder", type=int, default=50_000)
+    parser.add_argument("--path", help="Where to create folders", type=str, default=None)
+    parser.add_argument(
+        "--drop-caches", help="Drop page cache before each run", action="store_true"
+    )
+    return parser.parse_args()
+
+
+def fill_folder(folder: Path, files: int) -> None:
+    """Create empty files in random order, so listing and inode order differ.
+
+    Args:
+        folder (Path): empty folder
+        files (int): number of files
+    """
+    folder.mkdir()
+    names: list[int] = list(range(files))
+    random.Random(files).shuffle(names)
+    for name in names:
+        (folder / f"IMG-20230912-WA{name:08}.jpg").touch()
+
+
+def drop_caches() -> None:
+    """Write dirty pages and drop page, dentry and inode caches."""
+    os.sync()
+    subprocess.run(["sh", "-c", "echo 3 > /proc/sys/vm/drop_caches"], check=True)
+
+
+def run(folder: Path, order: str, drop: bool) -> float:
+    """Rename every file inside folder and return elapsed seconds.
+
+    Args:
+        folder (Path): synthetic folder
+        order (str): key from utils.schedule.ORDERS
+        drop (bool): drop caches before starting
+
+    Returns:
+        float: seconds
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        items = RenameItems(Constant(ORDER=order), FileStart, str(folder))  # type: ignore
+        if drop:
+            drop_caches()
+        start: float = time.perf_counter()
+        repr(items)
+        elapsed: float = time.perf_counter() - start
+    os.sync()
+    return elapsed
+
+
+def main() -> None:
+    """Run one identical folder for each order and print a summary."""
+    arguments = parse_command_line_arguments()
+    with tempfile.TemporaryDirectory(dir=arguments.path) as base:
+        results: dict[str, float] = {}
+        for order in ORDERS:
+            folder: Path = Path(base, order)
+            fill_folder(folder, arguments.files)
+            results[order] = run(folder, order, arguments.drop_caches)
+    reference: float = results["none"]
+    print(f"{arguments.files} files at {arguments.path or tempfile.gettempdir()}")
+    for order, elapsed in results.items():
+        rate: float = arguments.files / elapsed
+        print(
+            f"{order:>6}: {elapsed:8.3f} s  {rate:10.0f} files/s  "
+            f"{reference / elapsed:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,11 @@
 # MIT License
 """Logic service."""
 import argparse
-import os
-from pathlib import Path
 from typing import NamedTuple
 
+from utils.engine import Engine, Mkdir, Operation, Rename, Result
+from utils.filesystem import FileSystem, OSFileSystem
+
 
 class Constants(NamedTuple):
     """Class system with constants."""
@@ -64,9 +65,10 @@ class Constants(NamedTuple):
 class RenameFolder:
     """Main script."""
 
-    def __init__(self, constant: Constants) -> None:
+    def __init__(self, constant: Constants, filesystem: FileSystem | None = None) -> None:
         """Load constants variables."""
         self.constant = constant
+        self.filesystem: FileSystem = filesystem or OSFileSystem()
         self.home: str = self.constant.WORKING_DIRECTORY
         self.base: str = self.conform_home(self.constant.FOLDER)
         self.default: str = self.conform_path(self.constant.DEFAULT)
@@ -87,13 +89,14 @@ class RenameFolder:
         Returns:
             str | Exception: Good result or exception.
         """
-        if Path(self.default).exists():
+        if self.filesystem.exists(self.default):
             return self.__rename_folder(self.alt, self.default, self.constant.DEFAULT)
-        if Path(self.alt).exists():
+        if self.filesystem.exists(self.alt):
             return self.__rename_folder(self.default, self.alt, self.constant.ALT)
-        if Path(self.base).exists():
-            Path(self.alt).mkdir(exist_ok=True)
-            self.__rename_folder(self.default, self.alt, self.constant.ALT)
+        if self.filesystem.exists(self.base):
+            self.__rename_folder(
+                self.default, self.alt, self.constant.ALT, Mkdir(self.alt)
+            )
             return f"Create new /{self.constant.FOLDER} at {self.constant.WORKING_DIRECTORY}"
         raise FileNotFoundError
 
@@ -119,7 +122,9 @@ class RenameFolder:
         """
         return f"{self.home}/{folder}"
 
-    def __rename_folder(self, target: str, rename_from: str, surname: str) -> str:
+    def __rename_folder(
+        self, target: str, rename_from: str, surname: str, *prepare: Operation
+    ) -> str:
         """Rename two folders back and forth.
 
         First, rename base folder and append the surname.
@@ -129,12 +134,24 @@ class RenameFolder:
             target (str): current active folder
             rename_from (str): active folder when the script ends
             surname (str): new active folder
+            prepare (Operation): operations to run before renaming
+
+        Raises:
+            OSError: first operation that failed, following ones are skipped
 
         Returns:
             str: which folder is active
         """
-        os.rename(self.base, target)
-        os.rename(rename_from, self.base)
+        operations: list[Operation] = [
+            *prepare,
+            Rename(self.base, target),
+            Rename(rename_from, self.base),
+        ]
+        engine = Engine(filesystem=self.filesystem)
+        results: list[Result] = engine.run(operations, stop_on_error=True)
+        for result in results:
+            if result.error is not None:
+                raise result.error
         return self.achievement(surname, self.constant.FOLDER)
 
     @staticmethod
@@ -1,12 +1,21 @@
 # Copyright (C) 2023 Jaime Alvarez
 # MIT License
 """Script for renaming files from some starting string."""
-import os
 import re
+import stat
 import sys
+from concurrent.futures import Executor, ThreadPoolExecutor
 from enum import Enum
 from pathlib import Path
-from typing import Iterable, NamedTuple, NoReturn
+from typing import Any, Collection, Iterable, NamedTuple, NoReturn, Sequence
+
+from utils.compact import Labels, NameBuffer, NameIndex, Plan
+from utils.config import load
+from utils.engine import Engine, Hardlink, Mkdir, Operation, Remove, Rename, Result
+from utils.filesystem import Entry, FileSystem, OpenFolder, OSFileSystem
+from utils.layout import LAYOUTS, Layout
+from utils.schedule import ORDERS, Order
+from utils.throttle import Throttle
 
 
 class FileStart(Enum):
@@ -16,43 +25,90 @@ class FileStart(Enum):
     CASE_TWO = "VID-"
 
 
+class Duplicate(Enum):
+    """What to do when a colliding file holds the same content."""
+
+    # give it a new name, do not compare content
+    RENAME = "rename"
+    # leave file untouched
+    SKIP = "skip"
+    # keep file name but share content with existing file
+    HARDLINK = "hardlink"
+    # remove file, content already exists
+    DELETE = "delete"
+
+
 class Constant(NamedTuple):
     """General constants."""
 
     NEW_FILE: str = "_"
     SUBSTITUTE_WITH: str = ""
+    DUPLICATE: Duplicate = Duplicate.RENAME
+    # subdirectory layout from utils.layout: flat, date or hash
+    LAYOUT: str = "flat"
+    # rename order from utils.schedule: none, inode or name
+    ORDER: str = "none"
+    # renames per second, 0 means no limit
+    OPS_PER_SECOND: float = 0
+    # slow down when renames take longer than this, in seconds, 0 disables it
+    TARGET_LATENCY: float = 0
+    # run with idle I/O priority, only using disk time nobody else needs
+    IDLE: bool = False
+
+    def configured(self, settings: dict[str, Any]) -> "Constant":
+        """Create a new Constant tuple with settings from the config file.
+
+        Args:
+            settings (dict[str, Any]): rename_items section from utils.config
+
+        Returns:
+            Constant: Inmutable class with settings
+        """
+        if "DUPLICATE" in settings:
+            settings = {**settings, "DUPLICATE": Duplicate(settings["DUPLICATE"])}
+        return self._replace(**settings)
 
 
 class RenameItems:
     """Main process."""
 
     counter: int = 0
+    renamed: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    executor: Executor | None = None
 
     def __init__(
-        self, constant: Constant, enum_strings: FileStart, filepath: str = ""
+        self,
+        constant: Constant,
+        enum_strings: FileStart,
+        filepath: str = "",
+        layout: Layout | None = None,
+        destination: str = "",
+        order: Order | None = None,
+        filesystem: FileSystem | None = None,
     ) -> None:
         """Initialize process and check everything is OK."""
         self.constant = constant
+        self.filesystem: FileSystem = filesystem or OSFileSystem()
         self.start: tuple = self.grab_starting_strings(enum_strings)
         self.filepath: str = filepath
-        self.all_files: int = self.count_items(self.filepath)
-        self.dir_content: Iterable[Path] = self.grab_files(
-            Path(self.filepath), self.start
+        self.destination: str = destination or filepath
+        self.layout: Layout = layout or LAYOUTS[self.constant.LAYOUT]
+        self.order: Order | None = order or ORDERS[self.constant.ORDER]
+        self.dir_content: Iterable[Entry] = self.grab_files(
+            Path(self.filepath), self.start, self.filesystem
         )
 
         if not self.__check_folder_integrity():
             Utils.launch_exit("Error.")
-        Utils.broadcast_message((self.count_files(self.all_files, self.filepath)))
 
     def __check_folder_integrity(self) -> bool:
-        """Call functions for checking several integrity checks."""
-        folder: Path = Path(self.filepath)
-        return all(
-            (
-                self._folder_not_blank(),
-                self._check_folder_existence(folder),
-                self._folder_not_empty(),
-            )
+        """Call functions for checking several integrity checks, in order."""
+        return (
+            self._folder_not_blank()
+            and self._check_folder_existence(self.filepath)
+            and self._folder_not_empty()
         )
 
     @staticmethod
@@ -60,103 +116,258 @@ class RenameItems:
         """Return a tuple with all elements to check as starting string."""
         return tuple(x.value for x in enum_strings)  # type: ignore
 
-    @staticmethod
-    def count_items(filepath: str) -> int:
-        """Count number of files inside a folder.
-
-        Exclude folders inside parent folder.
-        Args:
-            filepath (str): absolute path
-
-        Returns:
-            int: total number of files
-        """
-        return len(list(filter(lambda file: file.is_file(), Path(filepath).iterdir())))
-
     def _folder_not_empty(self) -> bool:
-        """Check folder include at least one file inside."""
-        return self.all_files > 0
+        """Check folder include at least one file inside, stop at the first."""
+        entries = self.filesystem.scandir(self.filepath)
+        return any(file.is_file() for file in entries)
 
     def _folder_not_blank(self) -> bool:
         """Check filepath is not an empty string."""
         return self.filepath != ""
 
-    @staticmethod
-    def _check_folder_existence(folder: Path) -> bool:
+    def _check_folder_existence(self, folder: str) -> bool:
         """Check if folder exists and it's a working directory."""
-        return folder.exists() and folder.is_dir()
+        return self.filesystem.is_dir(folder)
 
     @staticmethod
-    def grab_files(filepath: Path, start: tuple[str]) -> Iterable[Path]:
-        """Filter files inside a directory."""
+    def grab_files(
+        filepath: Path, start: tuple[str], filesystem: FileSystem | None = None
+    ) -> Iterable[Entry]:
+        """Filter files inside a directory.
+
+        Items are folder entries with name, is_file() and stat().
+        """
         return filter(
             lambda file: file.is_file() and file.name.startswith(start),
-            filepath.iterdir(),
+            (filesystem or OSFileSystem()).scandir(str(filepath)),
         )
 
-    def iterate_filtered_files(self, filter_items: Iterable[Path]) -> str:
+    def iterate_filtered_files(self, filter_items: Iterable[Entry]) -> str:
         """Iterate through an iterable with all files you want to rename.
 
         Args:
-            filter_items (Iterable[Path]): Iterable
+            filter_items (Iterable[Entry]): Iterable
 
         Returns:
             str: final result from operation
         """
-        files: list[str] = [x.name for x in filter_items]
-        total_items: int = len(files)
-        for file in files:
-            self._rename_file(file)
-            self.add_one_item(total_items)
+        files, shards = self.scan(filter_items)
+        Utils.broadcast_message(self.count_files(len(files), self.filepath))
+        self.filesystem.makedirs(self.destination)
+        if self.constant.DUPLICATE is not Duplicate.RENAME:
+            self.executor = ThreadPoolExecutor()
+        try:
+            with self.filesystem.open_folder(self.destination) as target:
+                operations: Plan = self.plan(target, files, shards)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+        folders: int = len(set(shards.values) - {""})
+        total_items: int = len(operations) - folders
+        engine = Engine(
+            throttle=Throttle(
+                self.constant.OPS_PER_SECOND,
+                self.constant.TARGET_LATENCY,
+                self.constant.IDLE,
+            ),
+            filesystem=self.filesystem,
+        )
+        for result in engine.iterate(
+            operations, progress=lambda result: self.add_one_item(result, total_items)
+        ):
+            self.renamed += result.ok and isinstance(result.operation, Rename)
+            # counted as renamed before its copy across mounts failed
+            self.renamed -= result.late
+            self.failed += not result.ok
         return self.renamed_elements()
 
-    def _rename_file(self, file: str) -> None:
-        """Rename file and add one to global counter.
+    def scan(self, filter_items: Iterable[Entry]) -> tuple[NameBuffer, Labels]:
+        """Keep name and layout subdirectory of every file, in rename order.
+
+        Folder entries are dropped as soon as they are read, only names are
+        kept, packed, so very large folders fit in little memory.
 
         Args:
-            file (str): file name without path
+            filter_items (Iterable[Entry]): folder entries to rename
+
+        Returns:
+            tuple[NameBuffer, Labels]: file names and their subdirectories
         """
-        old_file = f"{self.filepath}/{file}"
-        new_file: str = self.conform_filepath(file)
-        os.rename(old_file, new_file)
+        files = NameBuffer()
+        shards = Labels()
+        keys: list = []
+        for entry in filter_items:
+            files.append(entry.name)
+            shards.append(self.layout(entry))
+            if self.order is not None:
+                keys.append(self.order(entry))
+        if self.order is None:
+            return files, shards
+        order: list[int] = sorted(range(len(keys)), key=keys.__getitem__)
+        return files.reordered(order), shards.reordered(order)
+
+    def plan(
+        self, target: OpenFolder, files: Sequence[str], shards: Sequence[str]
+    ) -> Plan:
+        """Decide what happens to every file before touching any of them.
+
+        All layout subdirectories are created first, then each file is
+        renamed or, if it is a duplicate, handled as Constant says.
 
-    def add_one_item(self, total: int) -> None:
+        Args:
+            target (OpenFolder): open destination folder
+            files (Sequence[str]): file names without path, in execution order
+            shards (Sequence[str]): relative subdirectory for each file
+
+        Returns:
+            Plan: operations for the engine
+        """
+        operations = Plan(
+            Mkdir(f"{self.destination}/{shard}") for shard in sorted(set(shards) - {""})
+        )
+        # name inside destination taken by an earlier file, and its position
+        planned = NameIndex()
+        for index, (file, shard) in enumerate(zip(files, shards)):
+            existing: str = self.relative_name(self.strip_string(file), shard)
+            claimed: int | None = planned.get(existing)
+            source: str = "" if claimed is None else files[claimed]
+            if self.is_duplicate(target, file, existing, source):
+                operations.extend(self.resolve_duplicate(file, existing))
+                continue
+            new_name: str = self.conform_name(target, file, shard, planned)
+            planned[new_name] = index
+            operations.append(
+                Rename(f"{self.filepath}/{file}", f"{self.destination}/{new_name}")
+            )
+        return operations
+
+    @staticmethod
+    def relative_name(file_name: str, shard: str = "") -> str:
+        """Return name relative to destination folder.
+
+        Args:
+            file_name (str): file name without path
+            shard (str, optional): relative subdirectory. Defaults to "".
+
+        Returns:
+            str: relative path
+        """
+        if shard == "":
+            return file_name
+        return f"{shard}/{file_name}"
+
+    def is_duplicate(
+        self, target: OpenFolder, file: str, existing: str, planned: str = ""
+    ) -> bool:
+        """Check if renamed file would collide with an identical file.
+
+        The identical file can already be inside destination folder, or be
+        planned to take that name earlier in the same run.
+
+        Args:
+            target (OpenFolder): open destination folder
+            file (str): name inside source folder
+            existing (str): name the file would get inside destination folder
+            planned (str, optional): name inside source folder of the file
+            planned to take existing. Defaults to "".
+
+        Returns:
+            bool: boolean value
+        """
+        if self.constant.DUPLICATE is Duplicate.RENAME:
+            return False
+        first: str = f"{self.filepath}/{file}"
+        second: str = target.absolute(existing)
+        if first == second:
+            return False
+        try:
+            if not stat.S_ISREG(target.stat(existing).st_mode):
+                return False
+        except FileNotFoundError:
+            if planned == "":
+                return False
+            # not renamed yet, content is still at its source
+            second = f"{self.filepath}/{planned}"
+        return self.filesystem.same_content(first, second, self.executor)
+
+    def resolve_duplicate(self, file: str, existing: str) -> list[Operation]:
+        """Apply duplicate policy from Constant instead of renaming.
+
+        Args:
+            file (str): name of duplicated file inside source folder
+            existing (str): name of file with same content inside destination
+
+        Returns:
+            list[Operation]: operations for the engine, none to skip it
+        """
+        self.duplicates += 1
+        if self.constant.DUPLICATE is Duplicate.DELETE:
+            return [Remove(f"{self.filepath}/{file}")]
+        if self.constant.DUPLICATE is Duplicate.HARDLINK:
+            return [Hardlink(f"{self.destination}/{existing}", f"{self.filepath}/{file}")]
+        return []
+
+    def add_one_item(self, result: Result, total: int) -> None:
         """Add one item to counter and broadcast current item.
 
         Args:
+            result (Result): finished operation
             total (int): Total number of items
         """
+        if isinstance(result.operation, Mkdir):
+            return
+        if result.late:
+            Utils.broadcast_message(f"Moving {result.operation[0]} failed: {result.error}")
+            return
         self.counter += 1
         message: str = self.log_info(self.counter, total)
+        if not result.ok:
+            message = f"{message} failed: {result.error}"
         Utils.broadcast_message(message)
 
     def renamed_elements(self) -> str:
         """Return result of operation."""
-        return f"{self.counter} elements renamed."
+        result: str = f"{self.renamed} elements renamed."
+        if self.duplicates > 0:
+            policy: str = self.constant.DUPLICATE.value
+            result = f"{result} {self.duplicates} duplicates ({policy})."
+        if self.failed > 0:
+            result = f"{result} {self.failed} failed."
+        return result
 
     def strip_string(self, file: str) -> str:
         """Replace FileStart elements with nothing ""."""
         join_tuple = "|".join(self.start)
         return re.sub(join_tuple, self.constant.SUBSTITUTE_WITH, file)
 
-    def conform_filepath(self, file: str) -> str:
-        """Rename file and conform absolute path for file.
+    def conform_name(
+        self,
+        target: OpenFolder,
+        file: str,
+        shard: str = "",
+        planned: Collection[str] = (),
+    ) -> str:
+        """Rename file and conform its name relative to destination folder.
 
-        If a file with the same name exists, give a different name with a new
-        character from Constants.
+        If a file with the same name exists, or another file is already
+        planned to take it, give a different name with a new character from
+        Constants.
 
         Args:
+            target (OpenFolder): open destination folder
             file (str): file name without path
+            shard (str, optional): relative subdirectory. Defaults to "".
+            planned (Collection[str], optional): names taken by earlier
+            files. Defaults to ().
 
         Returns:
-            str: absolute path
+            str: relative path
         """
-        file_name: str = self.strip_string(file)
-        new_filepath: str = f"{self.filepath}/{file_name}"
-        if Path(new_filepath).exists():
-            file_name: str = self.substitute_end_dot(file)
-            return f"{self.filepath}/{file_name}"
-        return new_filepath
+        new_name: str = self.relative_name(self.strip_string(file), shard)
+        if new_name in planned or target.exists(new_name):
+            return self.relative_name(self.substitute_end_dot(file), shard)
+        return new_name
 
     def substitute_end_dot(self, string: str) -> str:
         """Substitute end dot with underscore dot so there are no identical files."""
@@ -166,14 +377,14 @@ class RenameItems:
         """Show result of operation."""
         return self.call_process(self.dir_content)
 
-    def call_process(self, folder: Iterable[Path]) -> str:
+    def call_process(self, folder: Iterable[Entry]) -> str:
         """Run the process if all checks are OK."""
         return self.iterate_filtered_files(folder)
 
     @staticmethod
     def count_files(items: int, directory: str) -> str:
-        """Show how many files are inside a directory."""
-        return f"{items} files inside {directory}"
+        """Show how many files are going to be renamed inside a directory."""
+        return f"{items} files to rename inside {directory}"
 
     @staticmethod
     def log_info(item: int, total: int) -> str:
@@ -207,5 +418,18 @@ if __name__ == "__main__":
         temp: str = sys.argv[1]
     else:
         temp: str = input("Input folder: ")
-    print(RenameItems(constant=Constant(), enum_strings=FileStart, filepath=temp))  # type: ignore
+    # optional folder to move renamed files to, can be in another filesystem
+    target: str = sys.argv[2] if len(sys.argv) > 2 else ""
+    settings: dict[str, Any] = load()["rename_items"]
+    prefixes: tuple[str, ...] = settings.pop("FILE_START", ())
+    # start strings from config file replace FileStart
+    starts = Enum("FileStart", {x: x for x in prefixes}) if prefixes else FileStart
+    print(
+        RenameItems(
+            constant=Constant().configured(settings),
+            enum_strings=starts,  # type: ignore
+            filepath=temp,
+            destination=target,
+        )
+    )
     Utils.launch_exit()
@@ -1,10 +1,15 @@
 # Copyright (C) 2022 Jaime Alvarez
 # MIT License
 """Kube forwarder script."""
-import filecmp
+import hashlib
 import os
+import sys
 from pathlib import Path
-from typing import NamedTuple
+from typing import Any, NamedTuple
+
+from utils.config import load
+from utils.engine import AtomicWrite, Engine, Mkdir, Operation, Result, Symlink
+from utils.filesystem import FileSystem, OSFileSystem
 
 
 class Constants(NamedTuple):
@@ -14,34 +19,47 @@ class Constants(NamedTuple):
     ORIGIN: str = ".kube/config"
     # file kube forwarder read
     DESTINY: str = ".kube/config_abs"
-    # absolute path to WSL2
+    # absolute path to WSL2, active distro
     WSL_PATH: str = r"\\wsl$\Ubuntu"
     # folder location in WSL2
     HOME: str = "HOME"
+    # active minikube profile
+    PROFILE: str = "minikube"
+    # every WSL2 distro to render a config for
+    DISTROS: tuple[str, ...] = (r"\\wsl$\Ubuntu",)
+    # every minikube profile to render a config for
+    PROFILES: tuple[str, ...] = ("minikube",)
+    # folder with one rendered config for each distro and profile
+    VARIANTS: str = ".kube/config_abs.d"
+    # file inside VARIANTS with the origin state configs were rendered from
+    STAMP: str = ".origin"
 
 
 class Switcher:
     """Main script."""
 
-    def __init__(self, constant: Constants):
+    def __init__(self, constant: Constants, filesystem: FileSystem | None = None):
         """Conform absolute paths."""
         self.constant = constant
+        self.filesystem: FileSystem = filesystem or OSFileSystem()
         self.path: str = constant.WSL_PATH
         self.home = self.__get_home_directory(self.constant.HOME)
         self.origin: Path = self.__absolute_path(self.constant.ORIGIN)
         self.destiny: Path = self.__absolute_path(self.constant.DESTINY)
+        self.variants: Path = self.__absolute_path(self.constant.VARIANTS)
         self.origin_file: list[str] = []
 
     def __call__(self) -> str:
-        """Populate destiny file with correct path."""
-        if not self.__make_checks():
-            return "Failed operation."
+        """Render configs if origin changed and point destiny to active one."""
         try:
-            self.origin_file: list[str] = self.read_text(self.origin)
+            stamp: str = self.origin_stamp(self.get_current_windows_path())
         except FileNotFoundError:
             return "Origin file not found."
-
-        return self.populate_new_data()
+        if self.read_stamp() != stamp:
+            self.origin_file: list[str] = self.read_text(self.origin)
+            if not self.render_variants(stamp):
+                return "Failed operation."
+        return self.switch(self.path, self.constant.PROFILE)
 
     def __repr__(self) -> str:
         """Show result from operation."""
@@ -70,142 +88,128 @@ class Switcher:
         """
         return str(os.getenv(home))
 
-    def __make_checks(self) -> bool:
-        """Validate integrity and check everything is OK.
+    def targets(self) -> list[tuple[str, str]]:
+        """Every distro and profile combination, active one included.
 
         Returns:
-            bool: boolean value
+            list[tuple[str, str]]: distro and profile
         """
-        checks: list[bool] = [
-            self.check_existence(self.destiny),
-            self.check_integrity(self.destiny),
-            self.check_same_data(self.destiny),
-        ]
-        return all(checks)
+        distros: set[str] = {*self.constant.DISTROS, self.path}
+        profiles: set[str] = {*self.constant.PROFILES, self.constant.PROFILE}
+        return sorted((distro, profile) for distro in distros for profile in profiles)
 
-    @staticmethod
-    def check_existence(file: Path) -> bool:
-        """Check if file exists and create a new one if needed at set path.
-
-        Args:
-            file (Path): where the file is
-
-        Returns:
-            bool: boolean value
-        """
-        if not file.exists():
-            file.touch()
-        return True
+    def origin_stamp(self, current_path: str) -> str:
+        """Identify origin state without reading it.
 
-    @staticmethod
-    def compare_files(file1: Path, file2: Path) -> bool:
-        """Compare both files and their content.
+        Modification time and size of origin, current path and targets. If
+        any of them change, configs must be rendered again.
 
         Args:
-            file1 (Path): Path to file 1
-            file2 (Path): Path to file to compare against
+            current_path (str): valid windows path
 
         Returns:
-            bool: boolean value
+            str: hexadecimal digest
         """
-        return filecmp.cmp(file1, file2)
+        status = self.filesystem.stat(str(self.origin))
+        state: str = f"{status.st_mtime_ns}|{status.st_size}|{current_path}|{self.targets()}"
+        return hashlib.blake2b(state.encode(), digest_size=16).hexdigest()
 
-    @staticmethod
-    def read_text(file: Path) -> list[str]:
-        """Read text from file in path and split it in lines.
-
-        Args:
-            file (Path): file path
+    def read_stamp(self) -> str:
+        """Return stamp from last render, empty if there is none.
 
         Returns:
-            list[str]: content from file
+            str: hexadecimal digest
         """
-        return file.read_text(encoding="utf-8").splitlines()
-
-    def get_new_data(self, to_file: list[str]) -> list[str]:
-        """Populate file with new metadata.
+        try:
+            return self.read_text(self.variants / self.constant.STAMP)[0]
+        except (FileNotFoundError, IndexError):
+            return ""
 
-        Avoid overwrite of certificates
+    @staticmethod
+    def variant_name(distro: str, profile: str) -> str:
+        """File name for a distro and profile config.
 
         Args:
-            to_file (list[str]): file content from destiny file
+            distro (str): absolute path to WSL2, like \\\\wsl$\\Ubuntu
+            profile (str): minikube profile
 
         Returns:
-            list[str]: new content metadata
+            str: file name, like Ubuntu-minikube
         """
-        avoid: tuple[str, str, str] = (
-            "certificate-authority",
-            "client-certificate",
-            "client-key",
-        )
-
-        for index, line in enumerate(self.origin_file):
-            if to_file[index] != line and not line.strip().startswith(avoid):
-                to_file[index] = line
+        name: str = distro.rstrip("\\").rsplit("\\", 1)[-1]
+        return f"{name}-{profile}"
 
-        return to_file
+    def render_variants(self, stamp: str) -> bool:
+        """Write a translated config for every target from origin content.
 
-    def check_same_data(self, destiny_path: Path) -> bool:
-        """Check data against file.
+        Stamp is written last, only when every config is in place.
 
         Args:
-            destiny_path (Path): path to file
+            stamp (str): origin state configs are rendered from
 
         Returns:
             bool: boolean value
         """
-        if not self.compare_files(self.origin, destiny_path):
-            destiny: list[str] = self.read_text(destiny_path)
-            data: list[str] = self.get_new_data(destiny)
-            self.write_data(self.join_one_line(data), destiny_path)
-        return True
-
-    @staticmethod
-    def write_data(data: str, to_file: Path) -> None:
-        """Clear data and write new data to file.
-
-        Args:
-            data (str): data to write
-            to_file (Path): path to file
-        """
-        to_file.write_text("")
-        to_file.write_text(data)
-
-    def check_length(self, file2: Path) -> bool:
-        """Compare length of two files and check if its higher than zero.
+        current_path: str = self.get_current_windows_path()
+        operations: list[Operation] = [Mkdir(str(self.variants))]
+        for distro, profile in self.targets():
+            keys: dict[str, str] = self.get_key(current_path, distro, profile)
+            data: list[str] = self.set_wsl_path(list(self.origin_file), keys)
+            variant: Path = self.variants / self.variant_name(distro, profile)
+            operations.append(AtomicWrite(str(variant), self.encode(data)))
+        stamp_file: Path = self.variants / self.constant.STAMP
+        operations.append(AtomicWrite(str(stamp_file), stamp.encode()))
+        engine = Engine(filesystem=self.filesystem)
+        results: list[Result] = engine.run(operations, stop_on_error=True)
+        return len(results) == len(operations) and results[-1].ok
+
+    def switch(self, distro: str, profile: str) -> str:
+        """Point destiny to a rendered config, replacing it atomically.
+
+        A missing config is rendered again, even if stamp is up to date.
 
         Args:
-            file2 (Path): path to file
+            distro (str): absolute path to WSL2
+            profile (str): minikube profile
 
         Returns:
-            bool: boolean value
+            str: result of operation
         """
-        return 0 < self.get_text_length(self.origin) == self.get_text_length(file2)
+        variant: Path = self.variants / self.variant_name(distro, profile)
+        if not self.filesystem.exists(str(variant)):
+            self.origin_file = self.read_text(self.origin)
+            stamp: str = self.origin_stamp(self.get_current_windows_path())
+            if not self.render_variants(stamp):
+                return "Failed operation."
+        link_to: str = os.path.relpath(variant, self.destiny.parent)
+        engine = Engine(filesystem=self.filesystem)
+        results: list[Result] = engine.run([Symlink(link_to, str(self.destiny))])
+        if not results[0].ok:
+            return "Failed operation."
+        return "Success"
 
-    def check_integrity(self, file2: Path) -> bool:
-        """Check if there are any errors in file.
+    def read_text(self, file: Path) -> list[str]:
+        """Read text from file in path and split it in lines.
 
         Args:
-            file2 (Path): file to write to
+            file (Path): file path
 
         Returns:
-            bool: boolean value
+            list[str]: content from file
         """
-        if not self.check_length(file2):
-            origin_data = self.origin.read_text(encoding="utf-8")
-            self.write_data(origin_data, file2)
-        return True
+        return self.filesystem.read_bytes(str(file)).decode("utf-8").splitlines()
 
-    def get_text_length(self, file: Path) -> int:
-        """Return length of file.
+    @classmethod
+    def encode(cls, data: list[str]) -> bytes:
+        """Join lines and encode them to write them to a file.
 
         Args:
-            file (Path): file path
+            data (list[str]): lines to write
 
         Returns:
-            int: number of lines in file
+            bytes: file content
         """
-        return len(self.read_text(file))
+        return cls.join_one_line(data).encode("utf-8")
 
     @staticmethod
     def get_current_windows_path() -> str:
@@ -216,17 +220,25 @@ class Switcher:
         """
         return str(Path.resolve(Path(""))).replace("/", "\\")
 
-    def get_key(self, current_path: str) -> dict[str, str]:
+    def get_key(
+        self, current_path: str, distro: str = "", profile: str = ""
+    ) -> dict[str, str]:
         """Write key dictionary with certificates and a valid windows path.
 
+        Args:
+            current_path (str): valid windows path
+            distro (str, optional): absolute path to WSL2. Defaults to WSL_PATH.
+            profile (str, optional): minikube profile. Defaults to PROFILE.
+
         Returns:
             dict[str, str]: certificate path
         """
-        full_path: str = f"{self.path}{current_path}"
+        full_path: str = f"{distro or self.path}{current_path}"
+        profile = profile or self.constant.PROFILE
         keys: dict[str, str] = {
             "certificate-authority": f"{full_path}\\.minikube\\ca.crt",
-            "client-certificate": f"{full_path}\\.minikube\\profiles\\minikube\\client.crt",
-            "client-key": f"{full_path}\\.minikube\\profiles\\minikube\\client.key",
+            "client-certificate": f"{full_path}\\.minikube\\profiles\\{profile}\\client.crt",
+            "client-key": f"{full_path}\\.minikube\\profiles\\{profile}\\client.key",
         }
         return keys
 
@@ -276,19 +288,9 @@ class Switcher:
         """
         return "\n".join(data)
 
-    def populate_new_data(self) -> str:
-        """Logic component, build new data.
-
-        Returns:
-            str: result of operation
-        """
-        destiny_file: list[str] = self.read_text(self.destiny)
-        current_path: str = self.get_current_windows_path()
-        keys: dict[str, str] = self.get_key(current_path)
-        data = self.set_wsl_path(destiny_file, keys)
-        self.write_data(self.join_one_line(data), self.destiny)
-        return "Success"
-
 
 if __name__ == "__main__":
-    print(Switcher(constant=Constants()))
+    # optional active target: python3 switcher.py <wsl path> <profile>
+    arguments: dict[str, str] = dict(zip(("WSL_PATH", "PROFILE"), sys.argv[1:]))
+    settings: dict[str, Any] = {**load()["switcher"], **arguments}
+    print(Switcher(constant=Constants()._replace(**settings)))
@@ -0,0 +1,275 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Hold millions of file names and operations without an object for each.
+
+A Python str costs about 50 bytes plus its text, and a Path or folder entry
+several times that. Names are stored here as file system bytes packed into a
+single buffer, with their end offsets in an array, and only become str while
+somebody iterates over them.
+"""
+import os
+from array import array
+from typing import Iterable, Iterator, Sequence
+
+from utils.engine import Exchange, Hardlink, Mkdir, Operation, Remove, Rename, Symlink
+
+# operations made only of paths, index is the code stored for each operation
+KINDS: tuple[type, ...] = (Mkdir, Rename, Exchange, Symlink, Hardlink, Remove)
+
+
+class NameBuffer:
+    """List of names packed in one bytearray."""
+
+    __slots__ = ("data", "ends")
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        """Pack names, in order."""
+        self.data = bytearray()
+        self.ends = array("Q")
+        for name in names:
+            self.append(name)
+
+    def append(self, name: str) -> None:
+        """Add a name at the end.
+
+        Args:
+            name (str): file name, surrogate escapes allowed
+        """
+        self.data += os.fsencode(name)
+        self.ends.append(len(self.data))
+
+    def __len__(self) -> int:
+        """Number of names."""
+        return len(self.ends)
+
+    def __getitem__(self, index: int) -> str:
+        """Name at index, as os.fsdecode returns it."""
+        index = range(len(self.ends))[index]
+        start: int = self.ends[index - 1] if index > 0 else 0
+        return os.fsdecode(bytes(self.data[start : self.ends[index]]))
+
+    def __iter__(self) -> Iterator[str]:
+        """Names in order."""
+        start: int = 0
+        for end in self.ends:
+            yield os.fsdecode(bytes(self.data[start:end]))
+            start = end
+
+    def reordered(self, order: Sequence[int]) -> "NameBuffer":
+        """Return a new buffer with names in another order.
+
+        Args:
+            order (Sequence[int]): index of each name in the new order
+
+        Returns:
+            NameBuffer: names in new order
+        """
+        buffer = NameBuffer()
+        for index in order:
+            start: int = self.ends[index - 1] if index > 0 else 0
+            buffer.data += self.data[start : self.ends[index]]
+            buffer.ends.append(len(buffer.data))
+        return buffer
+
+
+class NameIndex:
+    """Map of names to integers, like dict[str, int], kept in arrays.
+
+    Names are packed in a NameBuffer. An open addressing table holds the
+    position of each name, and grows to stay at most half full.
+    """
+
+    __slots__ = ("names", "values", "slots")
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self.names = NameBuffer()
+        self.values = array("Q")
+        # position + 1 of the name in each slot, 0 for empty slots
+        self.slots = array("Q", bytes(8 * 8))
+
+    def __find(self, name: bytes) -> int:
+        """Return slot holding name, or empty slot where it belongs."""
+        mask: int = len(self.slots) - 1
+        slot: int = hash(name) & mask
+        while self.slots[slot] and self.__name(self.slots[slot] - 1) != name:
+            slot = (slot + 1) & mask
+        return slot
+
+    def __name(self, position: int) -> bytes:
+        """Encoded name at position."""
+        ends: array = self.names.ends
+        start: int = ends[position - 1] if position > 0 else 0
+        return bytes(self.names.data[start : ends[position]])
+
+    def __grow(self) -> None:
+        """Double table size and place every name again."""
+        self.slots = array("Q", bytes(len(self.slots) * 16))
+        mask: int = len(self.slots) - 1
+        for position in range(len(self.names)):
+            slot: int = hash(self.__name(position)) & mask
+            while self.slots[slot]:
+                slot = (slot + 1) & mask
+            self.slots[slot] = position + 1
+
+    def __setitem__(self, name: str, value: int) -> None:
+        """Add name or replace its value."""
+        slot: int = self.__find(os.fsencode(name))
+        if self.slots[slot]:
+            self.values[self.slots[slot] - 1] = value
+            return
+        self.names.append(name)
+        self.values.append(value)
+        self.slots[slot] = len(self.names)
+        if len(self.names) * 2 > len(self.slots):
+            self.__grow()
+
+    def get(self, name: str, default: int | None = None) -> int | None:
+        """Value for name, default if missing.
+
+        Args:
+            name (str): any name
+            default (int | None, optional): returned if missing. Defaults to
+            None.
+
+        Returns:
+            int | None: value
+        """
+        slot: int = self.__find(os.fsencode(name))
+        if not self.slots[slot]:
+            return default
+        return self.values[self.slots[slot] - 1]
+
+    def __getitem__(self, name: str) -> int:
+        """Value for name."""
+        value: int | None = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name: object) -> bool:
+        """Check if name was added."""
+        return isinstance(name, str) and self.get(name) is not None
+
+    def __len__(self) -> int:
+        """Number of names."""
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[str]:
+        """Names in insertion order."""
+        return iter(self.names)
+
+
+class Labels:
+    """List of strings with few distinct values, like subdirectories.
+
+    Each distinct string is kept once, every item is a 4 byte code.
+    """
+
+    __slots__ = ("values", "codes", "lookup")
+
+    def __init__(self, labels: Iterable[str] = ()) -> None:
+        """Store labels, in order."""
+        self.values: list[str] = []
+        self.codes = array("I")
+        self.lookup: dict[str, int] = {}
+        for label in labels:
+            self.append(label)
+
+    def code(self, label: str) -> int:
+        """Return code for a label, adding it if new.
+
+        Args:
+            label (str): any string
+
+        Returns:
+            int: position in values
+        """
+        if label not in self.lookup:
+            self.lookup[label] = len(self.values)
+            self.values.append(label)
+        return self.lookup[label]
+
+    def append(self, label: str) -> None:
+        """Add a label at the end."""
+        self.codes.append(self.code(label))
+
+    def __len__(self) -> int:
+        """Number of labels."""
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> str:
+        """Label at index."""
+        return self.values[self.codes[index]]
+
+    def __iter__(self) -> Iterator[str]:
+        """Labels in order."""
+        return (self.values[code] for code in self.codes)
+
+    def reordered(self, order: Sequence[int]) -> "Labels":
+        """Return new labels in another order, sharing distinct values.
+
+        Args:
+            order (Sequence[int]): index of each label in the new order
+
+        Returns:
+            Labels: labels in new order
+        """
+        labels = Labels()
+        labels.values = self.values
+        labels.lookup = self.lookup
+        labels.codes = array("I", (self.codes[index] for index in order))
+        return labels
+
+
+class Plan:
+    """List of operations made only of paths, like a list of Operation.
+
+    Each path is split in its folder, stored once in Labels, and its name,
+    packed in a NameBuffer. Operations are built back while iterating.
+    """
+
+    __slots__ = ("kinds", "folders", "names")
+
+    def __init__(self, operations: Iterable[Operation] = ()) -> None:
+        """Store operations, in order."""
+        self.kinds = array("B")
+        self.folders = Labels()
+        self.names = NameBuffer()
+        for operation in operations:
+            self.append(operation)
+
+    def append(self, operation: Operation) -> None:
+        """Add an operation at the end.
+
+        Args:
+            operation (Operation): one of KINDS
+
+        Raises:
+            TypeError: operation holds data other than paths
+        """
+        if type(operation) not in KINDS:
+            raise TypeError(f"{type(operation).__name__} can not be stored in a Plan")
+        self.kinds.append(KINDS.index(type(operation)))
+        for path in operation:
+            folder, name = os.path.split(path)
+            self.folders.append(folder)
+            self.names.append(name)
+
+    def extend(self, operations: Iterable[Operation]) -> None:
+        """Add several operations at the end."""
+        for operation in operations:
+            self.append(operation)
+
+    def __len__(self) -> int:
+        """Number of operations."""
+        return len(self.kinds)
+
+    def __iter__(self) -> Iterator[Operation]:
+        """Operations in order."""
+        paths: Iterator[str] = (
+            os.path.join(folder, name) for folder, name in zip(self.folders, self.names)
+        )
+        for code in self.kinds:
+            kind: type = KINDS[code]
+            yield kind(*(next(paths) for _ in kind._fields))
@@ -0,0 +1,207 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Load settings for every script from one TOML file.
+
+Parsing and validation happen once. The validated settings are cached with
+marshal, next to the modification time, size and hash of the file they came
+from, so later runs load them without importing a TOML parser.
+"""
+import contextlib
+import hashlib
+import marshal
+import os
+from pathlib import Path
+from typing import Any
+
+from utils.layout import LAYOUTS
+from utils.schedule import ORDERS
+
+# points to a config file other than the default one
+CONFIG_ENV: str = "HELPFUL_CAKES_CONFIG"
+# bump when cached settings layout or SCHEMA change
+VERSION: int = 1
+
+Settings = dict[str, dict[str, Any]]
+
+# section and key as written in the file, lower case, and allowed type or
+# choices. Keys are returned upper case, as constants name them.
+SCHEMA: dict[str, dict[str, type | tuple[str, ...]]] = {
+    "rename_items": {
+        "file_start": list,
+        "new_file": str,
+        "substitute_with": str,
+        "duplicate": ("rename", "skip", "hardlink", "delete"),
+        "layout": tuple(LAYOUTS),
+        "order": tuple(ORDERS),
+        "ops_per_second": float,
+        "target_latency": float,
+        "idle": bool,
+    },
+    "switcher": {
+        "origin": str,
+        "destiny": str,
+        "wsl_path": str,
+        "home": str,
+        "profile": str,
+        "distros": list,
+        "profiles": list,
+        "variants": str,
+        "stamp": str,
+    },
+    "rename_folder": {
+        "default": str,
+        "alt": str,
+        "join": ("_", "-", "#"),
+    },
+}
+
+
+def config_path() -> Path:
+    """Config file location, from CONFIG_ENV or XDG config folder.
+
+    Returns:
+        Path: config file, may not exist
+    """
+    if os.getenv(CONFIG_ENV):
+        return Path(os.environ[CONFIG_ENV])
+    base: str = os.getenv("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return Path(base, "helpful_cakes", "config.toml")
+
+
+def cache_path() -> Path:
+    """Cached settings location, in XDG cache folder.
+
+    Returns:
+        Path: cache file, may not exist
+    """
+    base: str = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return Path(base, "helpful_cakes", "config.marshal")
+
+
+def validate(document: dict[str, Any]) -> Settings:
+    """Check every section and key against SCHEMA.
+
+    Args:
+        document (dict[str, Any]): parsed TOML
+
+    Raises:
+        ValueError: unknown section or key, wrong type or choice
+
+    Returns:
+        Settings: upper case keys for each section, lists as tuples
+    """
+    settings: Settings = {section: {} for section in SCHEMA}
+    for section, values in document.items():
+        if section not in SCHEMA or not isinstance(values, dict):
+            raise ValueError(f"Unknown section [{section}]")
+        for key, value in values.items():
+            if key not in SCHEMA[section]:
+                raise ValueError(f"Unknown key {key} in [{section}]")
+            settings[section][key.upper()] = _check(
+                f"{section}.{key}", value, SCHEMA[section][key]
+            )
+    return settings
+
+
+def _check(name: str, value: Any, kind: type | tuple[str, ...]) -> Any:
+    """Validate a single value, return it as constants expect it."""
+    if isinstance(kind, tuple):
+        if value not in kind:
+            raise ValueError(f"{name} must be one of {', '.join(kind)}")
+        return value
+    if kind is list:
+        if not isinstance(value, list) or not all(isinstance(x, str) for x in value):
+            raise ValueError(f"{name} must be a list of strings")
+        return tuple(value)
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, kind):
+        raise ValueError(f"{name} must be {kind.__name__}")
+    return value
+
+
+def parse(data: bytes) -> Settings:
+    """Parse and validate config file content.
+
+    Args:
+        data (bytes): TOML document
+
+    Returns:
+        Settings: validated settings
+    """
+    try:
+        import tomllib
+    except ModuleNotFoundError:  # python < 3.11
+        import tomli as tomllib  # type: ignore
+
+    return validate(tomllib.loads(data.decode("utf-8")))
+
+
+def load(path: Path | None = None, cache: Path | None = None) -> Settings:
+    """Return validated settings, parsing config file only if it changed.
+
+    Cached settings are used while file modification time and size match.
+    Otherwise the file is read, and only parsed if its hash changed too.
+    Missing config file means defaults everywhere.
+
+    Args:
+        path (Path | None, optional): config file. Defaults to config_path().
+        cache (Path | None, optional): cache file. Defaults to cache_path().
+
+    Returns:
+        Settings: upper case keys for each section
+    """
+    path = path or config_path()
+    cache = cache or cache_path()
+    try:
+        status = path.stat()
+    except FileNotFoundError:
+        return {section: {} for section in SCHEMA}
+    key: tuple = (VERSION, str(path.resolve()))
+    stored: tuple | None = read_cache(cache)
+    if stored is not None and stored[0] == key:
+        if stored[1:3] == (status.st_mtime_ns, status.st_size):
+            return stored[4]
+    data: bytes = path.read_bytes()
+    digest: str = hashlib.blake2b(data, digest_size=16).hexdigest()
+    if stored is not None and stored[0] == key and stored[3] == digest:
+        settings: Settings = stored[4]
+    else:
+        settings: Settings = parse(data)
+    write_cache(cache, (key, status.st_mtime_ns, status.st_size, digest, settings))
+    return settings
+
+
+def read_cache(cache: Path) -> tuple | None:
+    """Read cached settings, None if missing or unreadable.
+
+    Args:
+        cache (Path): cache file
+
+    Returns:
+        tuple | None: key, mtime, size, hash and settings
+    """
+    try:
+        stored = marshal.loads(cache.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(stored, tuple) or len(stored) != 5:
+        return None
+    return stored
+
+
+def write_cache(cache: Path, stored: tuple) -> None:
+    """Replace cache atomically, a read-only cache folder only costs speed.
+
+    Args:
+        cache (Path): cache file
+        stored (tuple): key, mtime, size, hash and settings
+    """
+    temporary: Path = cache.with_name(f".{cache.name}.{os.getpid()}.tmp")
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        temporary.write_bytes(marshal.dumps(stored))
+        os.replace(temporary, cache)
+    except OSError:
+        with contextlib.suppress(OSError):
+            temporary.unlink()
@@ -0,0 +1,89 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Find out if two files hold exactly the same content."""
+import hashlib
+import mmap
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+
+# bytes read from the beginning of a file for a quick comparison
+PARTIAL_SIZE: int = 64 * 1024
+
+
+def same_size(first: Path, second: Path) -> bool:
+    """Cheapest check, files with different size can't be duplicates.
+
+    Args:
+        first (Path): file to compare
+        second (Path): file to compare against
+
+    Returns:
+        bool: boolean value
+    """
+    return first.stat().st_size == second.stat().st_size
+
+
+def partial_hash(file: Path, size: int = PARTIAL_SIZE) -> bytes:
+    """Hash only the first bytes of a file.
+
+    Args:
+        file (Path): file path
+        size (int, optional): bytes to read. Defaults to PARTIAL_SIZE.
+
+    Returns:
+        bytes: digest
+    """
+    with open(file, "rb") as handle:
+        return hashlib.blake2b(handle.read(size), digest_size=16).digest()
+
+
+def full_hash(file: Path) -> bytes:
+    """Hash the whole file, mapping it in memory instead of reading it.
+
+    Args:
+        file (Path): file path
+
+    Returns:
+        bytes: digest
+    """
+    digest = hashlib.blake2b()
+    with open(file, "rb") as handle:
+        # empty files can't be mapped
+        if handle.seek(0, 2) == 0:
+            return digest.digest()
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            digest.update(data)
+    return digest.digest()
+
+
+def is_duplicate(first: Path, second: Path, executor: Executor | None = None) -> bool:
+    """Compare by size, then partial hash and finally full hash.
+
+    Each stage is only reached if the previous one matched, so most
+    different files are discarded without reading them whole.
+
+    Args:
+        first (Path): file to compare
+        second (Path): file to compare against
+        executor (Executor | None, optional): pool to hash both files at
+        the same time. Defaults to a new thread pool.
+
+    Returns:
+        bool: boolean value
+    """
+    if not same_size(first, second):
+        return False
+    if first.stat().st_size <= PARTIAL_SIZE:
+        return partial_hash(first) == partial_hash(second)
+    if partial_hash(first) != partial_hash(second):
+        return False
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            return _compare_full_hash(first, second, pool)
+    return _compare_full_hash(first, second, executor)
+
+
+def _compare_full_hash(first: Path, second: Path, executor: Executor) -> bool:
+    """Hash both files in parallel and compare digests."""
+    one, two = executor.map(full_hash, (first, second))
+    return one == two
@@ -0,0 +1,373 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Run a declarative list of file operations.
+
+Tools plan what they want done as a list of operations, and the engine runs
+them in order, reusing one open folder for every name inside it, moving
+across filesystems when needed and returning a result for each operation.
+"""
+import errno
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, NamedTuple, Union
+
+from utils.filesystem import FileSystem, OpenFolder, OSFileSystem
+from utils.throttle import Throttle
+
+
+class Mkdir(NamedTuple):
+    """Create folder and its parents if missing."""
+
+    path: str
+
+
+class Rename(NamedTuple):
+    """Rename source to destination, can be in another filesystem."""
+
+    source: str
+    destination: str
+
+
+class Exchange(NamedTuple):
+    """Swap two existing names."""
+
+    first: str
+    second: str
+
+
+class AtomicWrite(NamedTuple):
+    """Replace file content, readers never see a partial file."""
+
+    path: str
+    data: bytes
+
+
+class Symlink(NamedTuple):
+    """Replace path with a symbolic link to link_to, atomically."""
+
+    link_to: str
+    path: str
+
+
+class Hardlink(NamedTuple):
+    """Replace path with a hardlink to source, atomically."""
+
+    source: str
+    path: str
+
+
+class Remove(NamedTuple):
+    """Delete a file."""
+
+    path: str
+
+
+Operation = Union[Mkdir, Rename, Exchange, AtomicWrite, Symlink, Hardlink, Remove]
+
+
+def written(operation: Operation) -> str:
+    """Path an operation creates or replaces.
+
+    Args:
+        operation (Operation): any operation
+
+    Returns:
+        str: path, destination for renames and first name for exchanges
+    """
+    if isinstance(operation, Rename):
+        return operation.destination
+    if isinstance(operation, Exchange):
+        return operation.first
+    return operation.path
+
+
+class Result(NamedTuple):
+    """Outcome of a single operation.
+
+    A rename across mounts finishes when its copy is flushed, after it was
+    reported done. If its source can not be deleted then, it is reported
+    again, failed and late.
+    """
+
+    operation: Operation
+    error: OSError | None = None
+    late: bool = False
+
+    @property
+    def ok(self) -> bool:
+        """Operation finished without errors."""
+        return self.error is None
+
+
+Execute = Callable[[Operation], Result]
+Progress = Callable[[Result], None]
+
+
+class Sequential:
+    """Run operations one after another, in order."""
+
+    def run(
+        self, operations: Iterable[Operation], execute: Execute, stop_on_error: bool
+    ) -> Iterator[Result]:
+        """Run every operation until the end or the first error.
+
+        Operations are read and results returned one at a time, so neither
+        has to fit in memory at once.
+
+        Args:
+            operations (Iterable[Operation]): operations in order
+            execute (Execute): runs a single operation
+            stop_on_error (bool): skip remaining operations after an error
+
+        Yields:
+            Iterator[Result]: one result for each operation run
+        """
+        for operation in operations:
+            result: Result = execute(operation)
+            yield result
+            if stop_on_error and not result.ok:
+                break
+
+
+class Parallel:
+    """Run operations of different folders at the same time.
+
+    Folders are created first. Then operations are grouped by the folder of
+    the path they write, each group runs in order in its own thread. Operations
+    in different groups must not depend on each other.
+    """
+
+    def __init__(self, workers: int = 4) -> None:
+        """Set maximum number of threads."""
+        self.workers: int = workers
+
+    def run(
+        self, operations: Iterable[Operation], execute: Execute, stop_on_error: bool
+    ) -> Iterator[Result]:
+        """Run folders first, then each group in parallel.
+
+        Args:
+            operations (Iterable[Operation]): operations in order
+            execute (Execute): runs a single operation
+            stop_on_error (bool): skip remaining operations of a group after
+            an error
+
+        Yields:
+            Iterator[Result]: one result for each operation run, in input order
+        """
+        operations = list(operations)
+        folders: list[Operation] = [x for x in operations if isinstance(x, Mkdir)]
+        results: list[Result] = list(Sequential().run(folders, execute, stop_on_error))
+        yield from results
+        if stop_on_error and any(not result.ok for result in results):
+            return
+        groups: dict[str, list[tuple[int, Operation]]] = defaultdict(list)
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, Mkdir):
+                groups[os.path.dirname(written(operation))].append((index, operation))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            done = pool.map(
+                lambda group: self.__run_group(group, execute, stop_on_error),
+                groups.values(),
+            )
+            ordered: list[tuple[int, Result]] = sorted(
+                (pair for group in done for pair in group), key=lambda pair: pair[0]
+            )
+        yield from (result for _, result in ordered)
+
+    @staticmethod
+    def __run_group(
+        group: list[tuple[int, Operation]], execute: Execute, stop_on_error: bool
+    ) -> list[tuple[int, Result]]:
+        """Run a single folder group in order."""
+        results: list[tuple[int, Result]] = []
+        for index, operation in group:
+            results.append((index, execute(operation)))
+            if stop_on_error and not results[-1][1].ok:
+                break
+        return results
+
+
+Backend = Union[Sequential, Parallel]
+
+
+class Engine:
+    """Run file operations with a backend, throttle and cross-mount moves."""
+
+    def __init__(
+        self,
+        backend: Backend | None = None,
+        throttle: Throttle | None = None,
+        filesystem: FileSystem | None = None,
+    ) -> None:
+        """Set how operations run, defaults to sequential without limits."""
+        self.backend: Backend = backend or Sequential()
+        self.throttle: Throttle = throttle or Throttle()
+        self.filesystem: FileSystem = filesystem or OSFileSystem()
+        self.folders: dict[str, OpenFolder] = {}
+        # renames copied across mounts, by source, until flushed
+        self.copies: dict[str, Rename] = {}
+        self.lock = threading.Lock()
+
+    def run(
+        self,
+        operations: Iterable[Operation],
+        progress: Progress | None = None,
+        stop_on_error: bool = False,
+    ) -> list[Result]:
+        """Run every operation and release open folders afterwards.
+
+        Args:
+            operations (Iterable[Operation]): operations in order
+            progress (Progress | None, optional): called after each operation.
+            Defaults to None.
+            stop_on_error (bool, optional): skip remaining operations after an
+            error. Defaults to False.
+
+        Returns:
+            list[Result]: one result for each operation run, then late failures
+        """
+        return list(self.iterate(operations, progress, stop_on_error))
+
+    def iterate(
+        self,
+        operations: Iterable[Operation],
+        progress: Progress | None = None,
+        stop_on_error: bool = False,
+    ) -> Iterator[Result]:
+        """Run every operation, returning results as they finish.
+
+        Like run, without keeping every result. Open folders are released
+        and copies across mounts flushed once results are exhausted, renames
+        whose copy fails then are reported again as late failures.
+
+        Args:
+            operations (Iterable[Operation]): operations in order
+            progress (Progress | None, optional): called after each operation.
+            Defaults to None.
+            stop_on_error (bool, optional): skip remaining operations after an
+            error. Defaults to False.
+
+        Yields:
+            Iterator[Result]: one result for each operation run, then late
+            failures
+        """
+
+        def execute(operation: Operation) -> Result:
+            result: Result = self.execute(operation)
+            if progress is not None:
+                progress(result)
+            return result
+
+        def report_late(operation: Rename, error: OSError) -> Result:
+            result: Result = Result(operation, error, late=True)
+            if progress is not None:
+                progress(result)
+            return result
+
+        flushed: bool = False
+        try:
+            yield from self.backend.run(operations, execute, stop_on_error)
+            failures: list[tuple[str, OSError]] = self.filesystem.flush()
+            flushed = True
+            for source, error in failures:
+                yield report_late(self.copies[os.path.normpath(source)], error)
+        finally:
+            if not flushed:
+                self.filesystem.flush()
+            self.copies.clear()
+            self.close()
+
+    def close(self) -> None:
+        """Close every open folder."""
+        with self.lock:
+            for folder in self.folders.values():
+                folder.close()
+            self.folders.clear()
+
+    def folder(self, path: str) -> tuple[OpenFolder, str]:
+        """Return open parent folder and name relative to it.
+
+        Args:
+            path (str): absolute path
+
+        Returns:
+            tuple[OpenFolder, str]: folder and name
+        """
+        parent, name = os.path.split(path)
+        with self.lock:
+            if parent not in self.folders:
+                self.folders[parent] = self.filesystem.open_folder(parent)
+            return self.folders[parent], name
+
+    def execute(self, operation: Operation) -> Result:
+        """Run a single operation inside throttle limits.
+
+        Args:
+            operation (Operation): what to do
+
+        Returns:
+            Result: operation and error if any
+        """
+        self.throttle.wait()
+        started: float = time.monotonic()
+        try:
+            self.__dispatch(operation)
+        except OSError as error:
+            return Result(operation, error)
+        finally:
+            self.throttle.record(time.monotonic() - started)
+        return Result(operation)
+
+    def __dispatch(self, operation: Operation) -> None:
+        """Call the right syscalls for an operation."""
+        if isinstance(operation, Mkdir):
+            self.filesystem.makedirs(operation.path)
+        elif isinstance(operation, Rename):
+            self.__rename(operation)
+        elif isinstance(operation, Exchange):
+            first, first_name = self.folder(operation.first)
+            second, second_name = self.folder(operation.second)
+            first.exchange(first_name, second, second_name)
+        elif isinstance(operation, AtomicWrite):
+            folder, name = self.folder(operation.path)
+            folder.write(f".{name}.tmp", operation.data)
+            folder.rename(f".{name}.tmp", folder, name)
+        elif isinstance(operation, Symlink):
+            folder, name = self.folder(operation.path)
+            self.__remove_leftover(folder, f".{name}.link")
+            folder.symlink(operation.link_to, f".{name}.link")
+            folder.rename(f".{name}.link", folder, name)
+        elif isinstance(operation, Hardlink):
+            source, source_name = self.folder(operation.source)
+            folder, name = self.folder(operation.path)
+            self.__remove_leftover(folder, f".{name}.link")
+            source.link(source_name, folder, f".{name}.link")
+            folder.rename(f".{name}.link", folder, name)
+        elif isinstance(operation, Remove):
+            folder, name = self.folder(operation.path)
+            folder.remove(name)
+
+    def __rename(self, operation: Rename) -> None:
+        """Rename relative to open folders, copy if in another filesystem."""
+        source, source_name = self.folder(operation.source)
+        target, target_name = self.folder(operation.destination)
+        try:
+            source.rename(source_name, target, target_name)
+        except OSError as error:
+            if error.errno != errno.EXDEV:
+                raise
+            self.filesystem.copy_across(operation.source, operation.destination)
+            with self.lock:
+                self.copies[os.path.normpath(operation.source)] = operation
+
+    @staticmethod
+    def __remove_leftover(folder: OpenFolder, name: str) -> None:
+        """Remove temporary name left by an interrupted run."""
+        try:
+            folder.remove(name)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,534 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Filesystems the scripts can plan and run against.
+
+OSFileSystem works with real files. MemoryFileSystem keeps a whole tree in
+memory, so big folders can be simulated fast, with several mounts and
+injected errors like EXDEV, ENOSPC or EEXIST.
+"""
+import errno
+import itertools
+import os
+import stat
+import time
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Iterable, Iterator, Protocol, Union
+
+from utils.duplicates import is_duplicate
+from utils.folder import Folder
+from utils.move import Mover
+
+# symbolic links followed before giving up, like the kernel
+MAX_LINKS: int = 40
+
+
+class OSFileSystem:
+    """Real filesystem, through the os module."""
+
+    def __init__(self, mover: Mover | None = None) -> None:
+        """Set how files are moved across mounts."""
+        self.mover: Mover = mover or Mover()
+
+    @staticmethod
+    def open_folder(path: str) -> Folder:
+        """Open a folder to work with names relative to it."""
+        return Folder(path)
+
+    @staticmethod
+    def makedirs(path: str) -> None:
+        """Create folder and its parents if missing."""
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def scandir(path: str) -> Iterator[os.DirEntry]:
+        """Folder entries, each with name, is_file() and stat().
+
+        Entries are read while iterating, a huge folder is never in memory
+        at once.
+        """
+        with os.scandir(path or os.curdir) as entries:
+            yield from entries
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Check if path exists."""
+        return os.path.exists(path)
+
+    @staticmethod
+    def is_dir(path: str) -> bool:
+        """Check if path is a folder."""
+        return os.path.isdir(path)
+
+    @staticmethod
+    def stat(path: str) -> os.stat_result:
+        """Return status of path."""
+        return os.stat(path)
+
+    @staticmethod
+    def read_bytes(path: str) -> bytes:
+        """Return whole file content."""
+        return Path(path).read_bytes()
+
+    @staticmethod
+    def same_content(first: str, second: str, executor: Executor | None = None) -> bool:
+        """Check if both files hold the same content."""
+        return is_duplicate(Path(first), Path(second), executor)
+
+    def copy_across(self, source: str, destination: str) -> None:
+        """Copy to another mount, source is deleted on flush."""
+        self.mover.copy_across(source, destination)
+
+    def flush(self) -> list[tuple[str, OSError]]:
+        """Finish pending copies across mounts.
+
+        Returns:
+            list[tuple[str, OSError]]: sources left in place and why
+        """
+        return self.mover.flush()
+
+
+class Node:
+    """File, folder or symbolic link inside a MemoryFileSystem."""
+
+    __slots__ = ("mode", "ino", "data", "link_to", "mtime_ns", "nlink")
+
+    def __init__(self, mode: int, ino: int, data: bytes = b"", link_to: str = "") -> None:
+        """Create node, modification time is now."""
+        self.mode: int = mode
+        self.ino: int = ino
+        self.data: bytes = data
+        self.link_to: str = link_to
+        self.mtime_ns: int = time.time_ns()
+        self.nlink: int = 1
+
+    def stat(self) -> os.stat_result:
+        """Return node status like os.stat does."""
+        size: int = len(self.data) if stat.S_ISREG(self.mode) else len(self.link_to)
+        seconds: float = self.mtime_ns / 1e9
+        # mode, ino, dev, nlink, uid, gid, size, atime, mtime, ctime
+        # then float times and nanosecond times
+        return os.stat_result(
+            (self.mode, self.ino, 0, self.nlink, 0, 0, size)
+            + (int(seconds),) * 3
+            + (seconds,) * 3
+            + (self.mtime_ns,) * 3
+        )
+
+
+class Entry(Protocol):
+    """Folder entry given to layouts and orders.
+
+    os.DirEntry and MemoryEntry fit it. Only name, inode(), is_file() and
+    stat() are available, not every Path method.
+    """
+
+    @property
+    def name(self) -> str:
+        """File name without folder."""
+        ...
+
+    def inode(self) -> int:
+        """Return inode number, without following links."""
+        ...
+
+    def is_file(self) -> bool:
+        """Check if entry is a regular file, following links."""
+        ...
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result:
+        """Return entry status."""
+        ...
+
+
+class MemoryEntry:
+    """Folder entry returned by MemoryFileSystem.scandir."""
+
+    __slots__ = ("name", "path", "filesystem")
+
+    def __init__(self, filesystem: "MemoryFileSystem", folder: str, name: str) -> None:
+        """Point entry to a name inside folder."""
+        self.filesystem = filesystem
+        self.name: str = name
+        self.path: str = f"{folder.rstrip('/')}/{name}"
+
+    def inode(self) -> int:
+        """Return inode number, without following links."""
+        return self.stat(follow_symlinks=False).st_ino
+
+    def is_file(self) -> bool:
+        """Check if entry is a regular file, following links."""
+        try:
+            return stat.S_ISREG(self.stat().st_mode)
+        except OSError:
+            return False
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        """Return entry status."""
+        return self.filesystem.stat(self.path, follow_symlinks)
+
+
+class MemoryFolder:
+    """Folder inside a MemoryFileSystem, same interface as utils.folder.Folder."""
+
+    def __init__(self, filesystem: "MemoryFileSystem", path: str) -> None:
+        """Open folder, it must exist."""
+        if not filesystem.is_dir(path):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        self.filesystem = filesystem
+        self.path: str = path
+
+    def __enter__(self) -> "MemoryFolder":
+        """Use as context manager."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Nothing to release."""
+
+    def close(self) -> None:
+        """Nothing to release."""
+
+    def absolute(self, name: str) -> str:
+        """Return absolute path for a name inside folder."""
+        return f"{self.path}/{name}"
+
+    def stat(self, name: str) -> os.stat_result:
+        """Return status of a name inside folder."""
+        return self.filesystem.stat(self.absolute(name))
+
+    def exists(self, name: str) -> bool:
+        """Check if name exists inside folder."""
+        return self.filesystem.exists(self.absolute(name))
+
+    def rename(self, name: str, target: "MemoryFolder", new_name: str) -> None:
+        """Rename name inside folder to new_name inside target folder."""
+        self.filesystem.rename(self.absolute(name), target.absolute(new_name))
+
+    def exchange(self, name: str, target: "MemoryFolder", new_name: str) -> None:
+        """Swap two existing names."""
+        self.filesystem.exchange(self.absolute(name), target.absolute(new_name))
+
+    def link(self, name: str, target: "MemoryFolder", new_name: str) -> None:
+        """Create new_name inside target as a hardlink to name."""
+        self.filesystem.link(self.absolute(name), target.absolute(new_name))
+
+    def symlink(self, link_to: str, name: str) -> None:
+        """Create a symbolic link named name pointing to link_to."""
+        self.filesystem.symlink(link_to, self.absolute(name))
+
+    def write(self, name: str, data: bytes) -> None:
+        """Create or truncate a file inside folder."""
+        self.filesystem.write_bytes(self.absolute(name), data)
+
+    def remove(self, name: str) -> None:
+        """Delete a file inside folder."""
+        self.filesystem.remove(self.absolute(name))
+
+    def makedirs(self, name: str) -> None:
+        """Create a relative subdirectory and all its parents."""
+        self.filesystem.makedirs(self.absolute(name))
+
+
+class MemoryFileSystem:
+    """Whole tree in memory, with mounts and injected errors.
+
+    Every folder is a dictionary from name to Node, so listing, lookups and
+    renames cost the same with ten or a million entries.
+    """
+
+    def __init__(self, mounts: Iterable[str] = ()) -> None:
+        """Create an empty tree with root folder.
+
+        Args:
+            mounts (Iterable[str], optional): folders in another filesystem,
+            renaming across them fails with EXDEV. Defaults to ().
+        """
+        self.inodes = itertools.count(1)
+        self.folders: dict[str, dict[str, Node]] = {"/": {}}
+        self.mounts: tuple[str, ...] = tuple(
+            sorted((os.path.normpath(x) for x in mounts), key=len, reverse=True)
+        )
+        self.failures: dict[tuple[str, str], list[int]] = {}
+        self.pending: list[str] = []
+
+    def fail(self, operation: str, path: str, code: int, times: int = 1) -> None:
+        """Make next calls of an operation on a path fail.
+
+        Args:
+            operation (str): rename, write, link, symlink, remove, mkdir or copy
+            path (str): absolute path, source for rename, link and copy
+            code (int): errno code, like errno.ENOSPC
+            times (int, optional): failing calls. Defaults to 1.
+        """
+        self.failures[(operation, os.path.normpath(path))] = [code, times]
+
+    def __check(self, operation: str, path: str) -> None:
+        """Raise an injected error if there is one left."""
+        failure: list[int] | None = self.failures.get((operation, path))
+        if failure is None:
+            return
+        failure[1] -= 1
+        if failure[1] <= 0:
+            del self.failures[(operation, path)]
+        raise OSError(failure[0], os.strerror(failure[0]), path)
+
+    @staticmethod
+    def __error(code: int, path: str) -> OSError:
+        """Build the same exception os would raise."""
+        return OSError(code, os.strerror(code), path)
+
+    def __split(self, path: str) -> tuple[dict[str, Node], str, str]:
+        """Return parent folder content, normalized path and name.
+
+        Raises:
+            OSError: parent folder does not exist
+        """
+        path = os.path.normpath(path)
+        parent, name = os.path.split(path)
+        children: dict[str, Node] | None = self.folders.get(parent)
+        if children is None:
+            raise self.__error(errno.ENOENT, path)
+        return children, path, name
+
+    def __node(self, path: str, follow_symlinks: bool = True) -> tuple[Node, str]:
+        """Return node and its real path, following links if asked.
+
+        Raises:
+            OSError: path does not exist or there are too many links
+        """
+        for _ in range(MAX_LINKS):
+            children, path, name = self.__split(path)
+            node: Node | None = children.get(name) if name else None
+            if path == "/":
+                return Node(stat.S_IFDIR | 0o755, 0), path
+            if node is None:
+                raise self.__error(errno.ENOENT, path)
+            if not follow_symlinks or not stat.S_ISLNK(node.mode):
+                return node, path
+            path = os.path.join(os.path.dirname(path), node.link_to)
+        raise self.__error(errno.ELOOP, path)
+
+    def __mount(self, path: str) -> str:
+        """Return mount a path belongs to."""
+        for mount in self.mounts:
+            if path == mount or path.startswith(f"{mount}/"):
+                return mount
+        return "/"
+
+    def open_folder(self, path: str) -> MemoryFolder:
+        """Open a folder to work with names relative to it."""
+        return MemoryFolder(self, path)
+
+    def makedirs(self, path: str) -> None:
+        """Create folder and its parents if missing.
+
+        Raises:
+            OSError: a parent is a file
+        """
+        path = os.path.normpath(path)
+        self.__check("mkdir", path)
+        current: str = "/"
+        for part in path.strip("/").split("/"):
+            children: dict[str, Node] = self.folders[current]
+            current = os.path.join(current, part)
+            node: Node | None = children.get(part)
+            if node is None:
+                children[part] = Node(stat.S_IFDIR | 0o755, next(self.inodes))
+                self.folders[current] = {}
+            elif not stat.S_ISDIR(node.mode):
+                raise self.__error(errno.EEXIST, current)
+
+    def write_bytes(self, path: str, data: bytes, mtime_ns: int | None = None) -> None:
+        """Create or truncate a file.
+
+        Args:
+            path (str): absolute path
+            data (bytes): whole file content
+            mtime_ns (int | None, optional): modification time. Defaults to now.
+        """
+        children, path, name = self.__split(path)
+        self.__check("write", path)
+        node: Node | None = children.get(name)
+        if node is not None and stat.S_ISDIR(node.mode):
+            raise self.__error(errno.EISDIR, path)
+        if node is None:
+            node = children[name] = Node(stat.S_IFREG | 0o644, next(self.inodes))
+        node.data = bytes(data)
+        node.mtime_ns = time.time_ns() if mtime_ns is None else mtime_ns
+
+    def read_bytes(self, path: str) -> bytes:
+        """Return whole file content."""
+        node, path = self.__node(path)
+        if stat.S_ISDIR(node.mode):
+            raise self.__error(errno.EISDIR, path)
+        return node.data
+
+    def scandir(self, path: str) -> list[MemoryEntry]:
+        """List folder entries, each with name, is_file() and stat()."""
+        _, path = self.__node(path)
+        children: dict[str, Node] | None = self.folders.get(path)
+        if children is None:
+            raise self.__error(errno.ENOTDIR, path)
+        return [MemoryEntry(self, path, name) for name in children]
+
+    def stat(self, path: str, follow_symlinks: bool = True) -> os.stat_result:
+        """Return status of path."""
+        return self.__node(path, follow_symlinks)[0].stat()
+
+    def exists(self, path: str) -> bool:
+        """Check if path exists, following links."""
+        try:
+            self.__node(path)
+        except OSError:
+            return False
+        return True
+
+    def is_dir(self, path: str) -> bool:
+        """Check if path is a folder."""
+        try:
+            return stat.S_ISDIR(self.__node(path)[0].mode)
+        except OSError:
+            return False
+
+    def rename(self, source: str, destination: str) -> None:
+        """Rename like os.rename, replacing destination files.
+
+        Raises:
+            OSError: missing source, crossing mounts or injected errors
+        """
+        source_children, source, source_name = self.__split(source)
+        self.__check("rename", source)
+        target_children, destination, target_name = self.__split(destination)
+        node: Node | None = source_children.get(source_name)
+        if node is None:
+            raise self.__error(errno.ENOENT, source)
+        if source == destination:
+            return
+        if self.__mount(source) != self.__mount(destination):
+            raise self.__error(errno.EXDEV, source)
+        existing: Node | None = target_children.get(target_name)
+        if existing is not None and stat.S_ISDIR(existing.mode):
+            if not stat.S_ISDIR(node.mode):
+                raise self.__error(errno.EISDIR, destination)
+            if self.folders[destination]:
+                raise self.__error(errno.ENOTEMPTY, destination)
+        elif existing is not None and stat.S_ISDIR(node.mode):
+            raise self.__error(errno.ENOTDIR, destination)
+        if existing is not None:
+            existing.nlink -= 1
+        target_children[target_name] = source_children.pop(source_name)
+        if stat.S_ISDIR(node.mode):
+            self.__move_folders(source, destination)
+
+    def __move_folders(self, source: str, destination: str) -> None:
+        """Rename folder contents after renaming a folder."""
+        for folder in [x for x in self.folders if x == source or x.startswith(f"{source}/")]:
+            self.folders[destination + folder[len(source) :]] = self.folders.pop(folder)
+
+    def exchange(self, first: str, second: str) -> None:
+        """Swap two existing names."""
+        first_children, first, first_name = self.__split(first)
+        second_children, second, second_name = self.__split(second)
+        self.__check("rename", first)
+        if first_name not in first_children:
+            raise self.__error(errno.ENOENT, first)
+        if second_name not in second_children:
+            raise self.__error(errno.ENOENT, second)
+        if self.__mount(first) != self.__mount(second):
+            raise self.__error(errno.EXDEV, first)
+        one: Node = first_children[first_name]
+        two: Node = second_children[second_name]
+        first_children[first_name], second_children[second_name] = two, one
+        temporary: str = f"{first}\0"
+        if stat.S_ISDIR(one.mode):
+            self.__move_folders(first, temporary)
+        if stat.S_ISDIR(two.mode):
+            self.__move_folders(second, first)
+        if stat.S_ISDIR(one.mode):
+            self.__move_folders(temporary, second)
+
+    def link(self, source: str, destination: str) -> None:
+        """Create destination as a hardlink to source."""
+        node, source = self.__node(source, follow_symlinks=False)
+        self.__check("link", source)
+        children, destination, name = self.__split(destination)
+        if name in children:
+            raise self.__error(errno.EEXIST, destination)
+        if stat.S_ISDIR(node.mode):
+            raise self.__error(errno.EPERM, source)
+        if self.__mount(source) != self.__mount(destination):
+            raise self.__error(errno.EXDEV, source)
+        node.nlink += 1
+        children[name] = node
+
+    def symlink(self, link_to: str, path: str) -> None:
+        """Create a symbolic link named path pointing to link_to."""
+        children, path, name = self.__split(path)
+        self.__check("symlink", path)
+        if name in children:
+            raise self.__error(errno.EEXIST, path)
+        children[name] = Node(stat.S_IFLNK | 0o777, next(self.inodes), link_to=link_to)
+
+    def remove(self, path: str) -> None:
+        """Delete a file or symbolic link."""
+        children, path, name = self.__split(path)
+        self.__check("remove", path)
+        node: Node | None = children.get(name)
+        if node is None:
+            raise self.__error(errno.ENOENT, path)
+        if stat.S_ISDIR(node.mode):
+            raise self.__error(errno.EISDIR, path)
+        node.nlink -= 1
+        del children[name]
+
+    def same_content(self, first: str, second: str, executor: Executor | None = None) -> bool:
+        """Check if both files hold the same content."""
+        return self.read_bytes(first) == self.read_bytes(second)
+
+    def copy_across(self, source: str, destination: str) -> None:
+        """Copy to another mount, source is deleted on flush."""
+        source = os.path.normpath(source)
+        self.__check("copy", source)
+        self.__copy(source, destination)
+        self.pending.append(source)
+
+    def __copy(self, source: str, destination: str) -> None:
+        """Copy a file, link or whole folder."""
+        node, source = self.__node(source, follow_symlinks=False)
+        if stat.S_ISDIR(node.mode):
+            self.makedirs(destination)
+            for name in list(self.folders[source]):
+                self.__copy(f"{source}/{name}", f"{destination}/{name}")
+        elif stat.S_ISLNK(node.mode):
+            self.symlink(node.link_to, destination)
+        else:
+            self.write_bytes(destination, node.data, node.mtime_ns)
+
+    def flush(self) -> list[tuple[str, OSError]]:
+        """Delete sources of finished copies across mounts.
+
+        Returns:
+            list[tuple[str, OSError]]: sources left in place and why
+        """
+        pending, self.pending = self.pending, []
+        failures: list[tuple[str, OSError]] = []
+        for source in pending:
+            try:
+                self.__check("remove", source)
+                self.__delete_tree(source)
+            except OSError as error:
+                failures.append((source, error))
+        return failures
+
+    def __delete_tree(self, path: str) -> None:
+        """Delete a file or a whole folder."""
+        children, path, name = self.__split(path)
+        node: Node = children.pop(name)
+        if stat.S_ISDIR(node.mode):
+            for folder in [x for x in self.folders if x == path or x.startswith(f"{path}/")]:
+                del self.folders[folder]
+
+
+FileSystem = Union[OSFileSystem, MemoryFileSystem]
+# folder returned by FileSystem.open_folder
+OpenFolder = Union[Folder, MemoryFolder]
@@ -0,0 +1,187 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Work with names relative to an open folder instead of absolute paths."""
+import ctypes
+import errno
+import os
+
+# every call used here accepts a folder file descriptor
+SUPPORTED: bool = {
+    os.open,
+    os.stat,
+    os.rename,
+    os.mkdir,
+    os.link,
+    os.unlink,
+    os.symlink,
+} <= os.supports_dir_fd
+# renameat2 flag swapping both names in a single call
+RENAME_EXCHANGE: int = 2
+# folder descriptor meaning current working directory
+AT_FDCWD: int = -100
+
+
+def _load_renameat2():
+    """Return libc renameat2 if there is one, Python has no binding for it."""
+    try:
+        return ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError):
+        return None
+
+
+_RENAMEAT2 = _load_renameat2()
+
+
+class Folder:
+    """Open a folder once and resolve every name from it.
+
+    The kernel only walks the folder path when opening it, and the run keeps
+    working on the same folder even if it is moved meanwhile. Where folder
+    descriptors are not supported, names are joined to the folder path.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open folder.
+
+        Args:
+            path (str): absolute path to folder
+        """
+        self.path: str = path
+        self.fd: int | None = None
+        if SUPPORTED:
+            self.fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+
+    def __enter__(self) -> "Folder":
+        """Use as context manager, close on exit."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close folder."""
+        self.close()
+
+    def close(self) -> None:
+        """Release file descriptor."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def absolute(self, name: str) -> str:
+        """Return absolute path for a name inside folder.
+
+        Args:
+            name (str): relative name
+
+        Returns:
+            str: absolute path
+        """
+        return f"{self.path}/{name}"
+
+    def _name(self, name: str) -> str:
+        """Name as the os calls need it, relative only with a descriptor."""
+        return name if self.fd is not None else self.absolute(name)
+
+    def stat(self, name: str) -> os.stat_result:
+        """Return status of a name inside folder."""
+        return os.stat(self._name(name), dir_fd=self.fd)
+
+    def exists(self, name: str) -> bool:
+        """Check if name exists inside folder."""
+        try:
+            self.stat(name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def rename(self, name: str, target: "Folder", new_name: str) -> None:
+        """Rename name inside folder to new_name inside target folder.
+
+        Args:
+            name (str): relative to this folder
+            target (Folder): folder where new_name lives, can be itself
+            new_name (str): relative to target folder
+        """
+        os.rename(
+            self._name(name),
+            target._name(new_name),
+            src_dir_fd=self.fd,
+            dst_dir_fd=target.fd,
+        )
+
+    def link(self, name: str, target: "Folder", new_name: str) -> None:
+        """Create new_name inside target as a hardlink to name."""
+        os.link(
+            self._name(name),
+            target._name(new_name),
+            src_dir_fd=self.fd,
+            dst_dir_fd=target.fd,
+        )
+
+    def exchange(self, name: str, target: "Folder", new_name: str) -> None:
+        """Swap two existing names in a single call.
+
+        Without renameat2 support, swap them with three renames through a
+        temporary name, which is not atomic.
+
+        Args:
+            name (str): relative to this folder
+            target (Folder): folder where new_name lives, can be itself
+            new_name (str): relative to target folder
+
+        Raises:
+            OSError: any of both names can't be swapped
+        """
+        if _RENAMEAT2 is not None:
+            result: int = _RENAMEAT2(
+                AT_FDCWD if self.fd is None else self.fd,
+                os.fsencode(self._name(name)),
+                AT_FDCWD if target.fd is None else target.fd,
+                os.fsencode(target._name(new_name)),
+                RENAME_EXCHANGE,
+            )
+            if result == 0:
+                return
+            code: int = ctypes.get_errno()
+            if code not in (errno.ENOSYS, errno.EINVAL):
+                raise OSError(code, os.strerror(code), self.absolute(name))
+        temporary: str = f"{name}.exchange"
+        self.rename(name, self, temporary)
+        target.rename(new_name, self, name)
+        self.rename(temporary, target, new_name)
+
+    def symlink(self, link_to: str, name: str) -> None:
+        """Create a symbolic link named name pointing to link_to."""
+        os.symlink(link_to, self._name(name), dir_fd=self.fd)
+
+    def write(self, name: str, data: bytes) -> None:
+        """Create or truncate a file inside folder and sync its content.
+
+        Args:
+            name (str): relative name
+            data (bytes): whole file content
+        """
+        flags: int = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        fd: int = os.open(self._name(name), flags, 0o644, dir_fd=self.fd)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def remove(self, name: str) -> None:
+        """Delete a file inside folder."""
+        os.unlink(self._name(name), dir_fd=self.fd)
+
+    def makedirs(self, name: str) -> None:
+        """Create a relative subdirectory and all its parents.
+
+        Args:
+            name (str): relative subdirectory, like 2023/09
+        """
+        parts: list[str] = [part for part in name.split("/") if part]
+        for index in range(len(parts)):
+            try:
+                os.mkdir(self._name("/".join(parts[: index + 1])), dir_fd=self.fd)
+            except FileExistsError:
+                pass
@@ -0,0 +1,64 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Choose in which subdirectory a renamed file ends up."""
+import hashlib
+import re
+import time
+from typing import Callable
+
+from utils.filesystem import Entry
+
+# date embedded in names like IMG-20230912-WA0001.jpg
+DATE_PATTERN = re.compile(r"-(\d{4})(\d{2})\d{2}-")
+
+Layout = Callable[[Entry], str]
+
+
+def flat(file: Entry) -> str:
+    """Keep every file in the same directory.
+
+    Args:
+        file (Entry): file to place
+
+    Returns:
+        str: empty subdirectory
+    """
+    return ""
+
+
+def by_date(file: Entry) -> str:
+    """Place file in year/month subdirectory.
+
+    Use the date inside file name, if there is none, use modification time.
+
+    Args:
+        file (Entry): file to place
+
+    Returns:
+        str: relative subdirectory, like 2023/09
+    """
+    match = DATE_PATTERN.search(file.name)
+    if match is not None and 1 <= int(match.group(2)) <= 12:
+        return f"{match.group(1)}/{match.group(2)}"
+    modified = time.localtime(file.stat().st_mtime)
+    return f"{modified.tm_year}/{modified.tm_mon:02}"
+
+
+def by_hash(file: Entry, length: int = 2) -> str:
+    """Place file in a subdirectory named after its name hash prefix.
+
+    Args:
+        file (Entry): file to place
+        length (int, optional): prefix length. Defaults to 2.
+
+    Returns:
+        str: relative subdirectory, like 3f
+    """
+    return hashlib.blake2b(file.name.encode(), digest_size=8).hexdigest()[:length]
+
+
+LAYOUTS: dict[str, Layout] = {
+    "flat": flat,
+    "date": by_date,
+    "hash": by_hash,
+}
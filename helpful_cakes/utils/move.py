@@ -0,0 +1,335 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Move files and folders, even across different filesystems."""
+import errno
+import os
+import shutil
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+from utils.duplicates import is_duplicate
+
+# parallel copy streams for a single file
+STREAMS: int = 4
+# files smaller than this are copied in one stream
+STREAM_SIZE: int = 64 * 1024 * 1024
+# copied files waiting for fsync before deleting their source
+BATCH: int = 64
+# biggest chunk sent to the kernel in one call
+CHUNK: int = 1024 * 1024 * 1024
+# errors meaning a zero-copy call is not available for these files
+UNSUPPORTED: tuple[int, ...] = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP)
+
+
+class Mover:
+    """Rename when possible, copy and delete when source is in another mount.
+
+    Copied sources are only deleted on flush, once their copy is synced to
+    disk and verified, so several files share the cost of syncing folders.
+    """
+
+    def __init__(self, streams: int = STREAMS, batch: int = BATCH, verify: bool = True):
+        """Set how copies are made and how many wait for a flush."""
+        self.streams: int = streams
+        self.batch: int = batch
+        self.verify: bool = verify
+        # source, destination and every file copied from one to the other
+        self.pending: list[tuple[str, str, list[tuple[str, str]]]] = []
+        # sources left in place by a flush, until flush returns them
+        self.failures: list[tuple[str, OSError]] = []
+
+    def __enter__(self) -> "Mover":
+        """Use as context manager, flush on exit."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Finish pending copies.
+
+        Raises:
+            OSError: first source that could not be moved
+        """
+        failures: list[tuple[str, OSError]] = self.flush()
+        if failures:
+            raise failures[0][1]
+
+    def move(self, source: str, destination: str) -> None:
+        """Move file or folder to destination.
+
+        Args:
+            source (str): absolute path
+            destination (str): absolute path
+
+        Raises:
+            OSError: any rename error other than crossing filesystems
+        """
+        try:
+            os.rename(source, destination)
+            return
+        except OSError as error:
+            if error.errno != errno.EXDEV:
+                raise
+        self.copy_across(source, destination)
+
+    def copy_across(self, source: str, destination: str) -> None:
+        """Copy file or folder and leave its source pending for deletion.
+
+        Sources fully copied are flushed every batch, their failures wait to
+        be returned by the next explicit flush.
+
+        Args:
+            source (str): absolute path
+            destination (str): absolute path in another filesystem
+        """
+        # every regular file copied, to sync and verify before deleting
+        copied: list[tuple[str, str]] = []
+
+        def copy(src: str, dst: str) -> str:
+            copied.append((src, copy_file(src, dst, self.streams)))
+            return dst
+
+        if os.path.isdir(source):
+            partial: str = partial_name(destination)
+            try:
+                shutil.copytree(source, partial, symlinks=True, copy_function=copy)
+                os.replace(partial, destination)
+            except BaseException:
+                shutil.rmtree(partial, ignore_errors=True)
+                raise
+            copied = [(src, destination + dst[len(partial) :]) for src, dst in copied]
+        else:
+            copy(source, destination)
+        self.pending.append((source, destination, copied))
+        if len(self.pending) >= self.batch:
+            self.__flush()
+
+    def flush(self) -> list[tuple[str, OSError]]:
+        """Sync pending copies, verify them and delete their sources.
+
+        Every copied file is synced and verified, also inside folders, so no
+        source is deleted before its whole copy is safe on disk. A source
+        whose copy can not be made safe is kept, its copy removed, and the
+        error returned for it instead of raised.
+
+        Returns:
+            list[tuple[str, OSError]]: sources that failed and why, also in
+            flushes made while copying
+        """
+        self.__flush()
+        failures, self.failures = self.failures, []
+        return failures
+
+    def __flush(self) -> None:
+        """Flush pending copies, keeping failures until flush returns them."""
+        pending, self.pending = self.pending, []
+        safe: list[tuple[str, str, list[tuple[str, str]]]] = []
+        folders: set[str] = set()
+        for source, destination, copied in pending:
+            try:
+                for _, copy in copied:
+                    sync(copy)
+            except OSError as error:
+                self.__discard(source, destination, error)
+                continue
+            folders.add(os.path.dirname(destination))
+            if os.path.isdir(destination):
+                folders.update(root for root, _, _ in os.walk(destination))
+            safe.append((source, destination, copied))
+        try:
+            sync_folders(folders)
+        except OSError as error:
+            for source, destination, _ in safe:
+                self.__discard(source, destination, error)
+            safe = []
+        deleted: list[str] = []
+        for source, destination, copied in safe:
+            try:
+                for original, copy in copied:
+                    self.__check_copy(original, copy)
+            except OSError as error:
+                self.__discard(source, destination, error)
+                continue
+            try:
+                if os.path.isdir(source):
+                    shutil.rmtree(source)
+                else:
+                    os.remove(source)
+            except OSError as error:
+                self.failures.append((source, error))
+                continue
+            deleted.append(source)
+        try:
+            sync_folders(os.path.dirname(source) for source in deleted)
+        except OSError as error:
+            self.failures.extend((source, error) for source in deleted)
+
+    def __discard(self, source: str, destination: str, error: OSError) -> None:
+        """Remove a copy that is not safe and keep its source as it was."""
+        self.failures.append((source, error))
+        with suppress(OSError):
+            if os.path.isdir(destination) and not os.path.islink(destination):
+                shutil.rmtree(destination)
+            else:
+                os.remove(destination)
+
+    def __check_copy(self, source: str, destination: str) -> None:
+        """Raise before deleting a source whose copy is not identical."""
+        if not self.verify:
+            return
+        if not is_duplicate(Path(source), Path(destination)):
+            raise OSError(errno.EIO, "Copy differs from source", destination)
+
+
+def copy_file(source: str, destination: str, streams: int = STREAMS) -> str:
+    """Copy file content in parallel ranges and preserve its metadata.
+
+    Args:
+        source (str): absolute path
+        destination (str): absolute path
+        streams (int, optional): parallel ranges. Defaults to STREAMS.
+
+    Returns:
+        str: destination
+    """
+    size: int = os.stat(source).st_size
+    # only a complete copy ever holds the destination name
+    partial: str = partial_name(destination)
+    try:
+        fd: int = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+        ranges: list[tuple[int, int]] = split_ranges(size, streams)
+        if len(ranges) == 1:
+            copy_range(source, partial, *ranges[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                list(pool.map(lambda rng: copy_range(source, partial, *rng), ranges))
+        copy_metadata(source, partial)
+        os.replace(partial, destination)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(partial)
+        raise
+    return destination
+
+
+def partial_name(path: str) -> str:
+    """Hidden name, next to path, for a copy still in progress.
+
+    Args:
+        path (str): final path
+
+    Returns:
+        str: path in the same folder
+    """
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f".{name}.partial")
+
+
+def split_ranges(size: int, streams: int) -> list[tuple[int, int]]:
+    """Split a file in (offset, length) ranges, one for each stream.
+
+    Args:
+        size (int): file size in bytes
+        streams (int): maximum number of ranges
+
+    Returns:
+        list[tuple[int, int]]: offset and length
+    """
+    if size < STREAM_SIZE or streams <= 1:
+        return [(0, size)]
+    step: int = -(-size // streams)
+    return [(offset, min(step, size - offset)) for offset in range(0, size, step)]
+
+
+def copy_range(source: str, destination: str, offset: int, length: int) -> None:
+    """Copy a range of bytes, with its own file descriptors.
+
+    Args:
+        source (str): absolute path
+        destination (str): absolute path
+        offset (int): first byte
+        length (int): bytes to copy
+
+    Raises:
+        OSError: source is shorter than expected
+    """
+    src: int = os.open(source, os.O_RDONLY)
+    try:
+        dst: int = os.open(destination, os.O_WRONLY)
+        try:
+            end: int = offset + length
+            while offset < end:
+                sent: int = _transfer(src, dst, offset, min(end - offset, CHUNK))
+                if sent == 0:
+                    raise OSError(errno.EIO, "Unexpected end of file", source)
+                offset += sent
+        finally:
+            os.close(dst)
+    finally:
+        os.close(src)
+
+
+def _transfer(src: int, dst: int, offset: int, count: int) -> int:
+    """Send bytes with the cheapest call available.
+
+    copy_file_range keeps data inside the kernel and may share blocks,
+    sendfile keeps data inside the kernel, pread/pwrite always works.
+    """
+    try:
+        return os.copy_file_range(src, dst, count, offset, offset)
+    except AttributeError:
+        pass
+    except OSError as error:
+        if error.errno not in UNSUPPORTED:
+            raise
+    try:
+        os.lseek(dst, offset, os.SEEK_SET)
+        return os.sendfile(dst, src, offset, count)
+    except AttributeError:
+        pass
+    except OSError as error:
+        if error.errno not in UNSUPPORTED:
+            raise
+    return os.pwrite(dst, os.pread(src, min(count, STREAM_SIZE), offset), offset)
+
+
+def copy_metadata(source: str, destination: str) -> None:
+    """Copy permissions, timestamps, extended attributes and owner if allowed.
+
+    Args:
+        source (str): absolute path
+        destination (str): absolute path
+    """
+    status = os.stat(source)
+    try:
+        os.chown(destination, status.st_uid, status.st_gid)
+    except PermissionError:
+        pass
+    shutil.copystat(source, destination)
+
+
+def sync(file: str) -> None:
+    """Flush file or folder to disk.
+
+    Args:
+        file (str): absolute path
+    """
+    fd: int = os.open(file, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_folders(folders: Iterable[str]) -> None:
+    """Flush every distinct folder once.
+
+    Args:
+        folders (Iterable[str]): absolute paths, repeated are ignored
+    """
+    for folder in sorted(set(folders)):
+        sync(folder)
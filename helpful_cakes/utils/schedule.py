@@ -0,0 +1,43 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Choose in which order planned file operations run."""
+from typing import Any, Callable
+
+from utils.filesystem import Entry
+
+Order = Callable[[Entry], Any]
+
+
+def by_inode(file: Entry) -> int:
+    """Inode number, neighbour inodes share inode table blocks.
+
+    os.DirEntry already holds it from the listing, no stat call is made.
+
+    Args:
+        file (Entry): file to order
+
+    Returns:
+        int: inode number
+    """
+    return file.inode()
+
+
+def by_name(file: Entry) -> str:
+    """File name, for reproducible runs.
+
+    Args:
+        file (Entry): file to order
+
+    Returns:
+        str: file name
+    """
+    return file.name
+
+
+ORDERS: dict[str, Order | None] = {
+    # same order directory listing returns
+    "none": None,
+    "inode": by_inode,
+    "name": by_name,
+}
+
@@ -0,0 +1,129 @@
+# Copyright (C) 2023 Jaime Alvarez
+# MIT License
+"""Keep file operations from starving other services sharing the storage."""
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+# rate multiplier when operations get slower than target latency
+BACKOFF: float = 0.5
+# rate multiplier when operations are faster than target latency
+RECOVER: float = 1.05
+# never go slower than this, operations per second
+MIN_RATE: float = 1.0
+# weight of the last operation in the latency average
+SMOOTHING: float = 0.2
+# operations the average needs to reflect a new rate, one backoff for each
+WINDOW: int = round(1 / SMOOTHING)
+
+
+class Throttle:
+    """Limit operations per second and adapt to observed latency.
+
+    Use as context manager around every operation:
+
+        with throttle:
+            os.rename(old, new)
+
+    Rate is lowered when the latency average and the last operation go over
+    target, at most once per WINDOW operations so a short spike costs a
+    single backoff, and raised again, up to the limit, while the average
+    stays under target.
+    """
+
+    def __init__(
+        self, ops_per_second: float = 0, latency: float = 0, idle: bool = False
+    ) -> None:
+        """Set limits, zero means no limit.
+
+        Args:
+            ops_per_second (float, optional): maximum rate. Defaults to 0.
+            latency (float, optional): target seconds per operation. Defaults to 0.
+            idle (bool, optional): run with idle I/O and CPU priority. Defaults to False.
+        """
+        self.limit: float = ops_per_second
+        self.rate: float = ops_per_second
+        self.latency: float = latency
+        self.average: float = 0.0
+        # operations recorded since rate was last lowered
+        self.since_backoff: int = WINDOW
+        self.next_slot: float = time.monotonic()
+        self.started: float = 0.0
+        self.lock = threading.Lock()
+        if idle:
+            set_idle_priority()
+
+    def __enter__(self) -> "Throttle":
+        """Wait for next slot and start timing operation."""
+        self.wait()
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Adapt rate to how long operation took."""
+        self.record(time.monotonic() - self.started)
+
+    def wait(self) -> None:
+        """Sleep until operation fits inside current rate.
+
+        Threads share the rate, each one waits for its own slot.
+        """
+        with self.lock:
+            if self.rate <= 0:
+                return
+            now: float = time.monotonic()
+            slot: float = max(now, self.next_slot)
+            self.next_slot = slot + 1 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def record(self, elapsed: float) -> None:
+        """Add operation latency to average and adapt rate.
+
+        Args:
+            elapsed (float): seconds operation took
+        """
+        if self.latency <= 0:
+            return
+        with self.lock:
+            self.__adapt(elapsed)
+
+    def __adapt(self, elapsed: float) -> None:
+        """Move rate towards target latency, lock must be held."""
+        self.average += SMOOTHING * (elapsed - self.average)
+        self.since_backoff += 1
+        if self.average > self.latency:
+            if self.since_backoff < WINDOW or elapsed <= self.latency:
+                # average still holds latency from before last backoff, or
+                # from a spike that is already over
+                return
+            # without limit, start from current throughput
+            current: float = self.rate if self.rate > 0 else 1 / max(elapsed, 1e-6)
+            self.rate = max(MIN_RATE, current * BACKOFF)
+            self.since_backoff = 0
+        elif self.rate > 0:
+            self.rate *= RECOVER
+            if self.limit > 0:
+                self.rate = min(self.limit, self.rate)
+
+
+def set_idle_priority() -> None:
+    """Lower CPU priority and move process to idle I/O class.
+
+    Idle I/O class only gets disk time when nobody else asks for it. Needs
+    util-linux ionice, otherwise only CPU priority is lowered.
+    """
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, 19)
+    except (AttributeError, PermissionError):
+        pass
+    ionice: str | None = shutil.which("ionice")
+    if ionice is not None:
+        subprocess.run(
+            [ionice, "-c", "3", "-p", str(os.getpid())],
+            check=False,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
@@ -0,0 +1,48 @@
+import os
+import unittest
+
+from utils.compact import Labels, NameBuffer, NameIndex, Plan
+from utils.engine import AtomicWrite, Hardlink, Mkdir, Remove, Rename
+
+
+class TestCompact(unittest.TestCase):
+    def test_name_buffer(self):
+        names = ["IMG-1.jpg", "", "fotó.jpg", os.fsdecode(b"\xff.jpg")]
+        buffer = NameBuffer(names)
+        self.assertEqual(len(buffer), 4)
+        self.assertListEqual(list(buffer), names)
+        self.assertEqual(buffer[-2], "fotó.jpg")
+        self.assertListEqual(list(buffer.reordered([3, 0])), [names[3], names[0]])
+        with self.assertRaises(IndexError):
+            buffer[4]
+
+    def test_name_index(self):
+        index = NameIndex()
+        for number in range(1000):
+            index[f"{number}.jpg"] = number
+        index["0.jpg"] = 7
+        self.assertEqual(len(index), 1000)
+        self.assertEqual(index["999.jpg"], 999)
+        self.assertEqual(index.get("0.jpg"), 7)
+        self.assertIsNone(index.get("1000.jpg"))
+        self.assertNotIn("1000.jpg", index)
+        with self.assertRaises(KeyError):
+            index["1000.jpg"]
+
+    def test_labels(self):
+        labels = Labels(["2023/09", "", "2023/09"])
+        self.assertListEqual(labels.values, ["2023/09", ""])
+        self.assertListEqual(list(labels.reordered([1, 0])), ["", "2023/09"])
+
+    def test_plan(self):
+        operations = [
+            Mkdir("/data/2023/09"),
+            Rename("/data/IMG-1.jpg", "/data/2023/09/1.jpg"),
+            Hardlink("/data/2023/09/1.jpg", "/data/IMG-2.jpg"),
+            Remove("relative.jpg"),
+        ]
+        plan = Plan(operations)
+        self.assertEqual(len(plan), 4)
+        self.assertListEqual(list(plan), operations)
+        with self.assertRaises(TypeError):
+            plan.append(AtomicWrite("/data/file", b""))
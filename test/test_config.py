@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from rename_items import Constant, Duplicate
+from utils import config
+
+CONTENT = """
+[rename_items]
+duplicate = "hardlink"
+ops_per_second = 200
+file_start = ["IMG-", "PXL_"]
+
+[switcher]
+profiles = ["minikube", "dev"]
+"""
+
+
+class TestConfig(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = Path(self.folder.name, "config.toml")
+        self.cache = Path(self.folder.name, "cache", "config.marshal")
+        self.path.write_text(CONTENT)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_validated_settings(self):
+        settings = config.load(self.path, self.cache)
+        items = settings["rename_items"]
+        self.assertEqual(items["OPS_PER_SECOND"], 200.0)
+        self.assertEqual(items.pop("FILE_START"), ("IMG-", "PXL_"))
+        self.assertIs(Constant().configured(items).DUPLICATE, Duplicate.HARDLINK)
+        self.assertEqual(settings["switcher"]["PROFILES"], ("minikube", "dev"))
+        self.assertDictEqual(settings["rename_folder"], {})
+
+    def test_invalid_settings(self):
+        for content in ('[rename_items]\nlayout = "tree"', "[other]\nkey = 1"):
+            self.path.write_text(content)
+            with self.assertRaises(ValueError):
+                config.load(self.path, self.cache)
+
+    def test_cache(self):
+        config.load(self.path, self.cache)
+        with mock.patch("utils.config.parse") as parse:
+            config.load(self.path, self.cache)
+            # same content, new modification time
+            os.utime(self.path, ns=(0, 0))
+            settings = config.load(self.path, self.cache)
+            self.assertEqual(settings["switcher"]["PROFILES"][1], "dev")
+            parse.assert_not_called()
+        self.path.write_text("[switcher]\nprofile = 'dev'")
+        self.assertDictEqual(config.load(self.path, self.cache)["switcher"], {"PROFILE": "dev"})
+
+    def test_missing_file(self):
+        self.path.unlink()
+        self.assertDictEqual(config.load(self.path, self.cache)["switcher"], {})
+        self.assertFalse(self.cache.exists())
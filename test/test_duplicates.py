@@ -0,0 +1,36 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.duplicates import PARTIAL_SIZE, full_hash, is_duplicate
+
+
+class TestDuplicates(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.base = Path(self.folder.name)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, name: str, data: bytes) -> Path:
+        file = self.base / name
+        file.write_bytes(data)
+        return file
+
+    def test_same_content(self):
+        data: bytes = b"a" * (PARTIAL_SIZE * 3)
+        self.assertTrue(is_duplicate(self.write("one", data), self.write("two", data)))
+
+    def test_different_size(self):
+        self.assertFalse(is_duplicate(self.write("one", b"ab"), self.write("two", b"a")))
+
+    def test_different_tail(self):
+        data: bytes = b"a" * (PARTIAL_SIZE * 2)
+        one: Path = self.write("one", data + b"a")
+        two: Path = self.write("two", data + b"b")
+        self.assertFalse(is_duplicate(one, two))
+
+    def test_empty_file(self):
+        empty: bytes = full_hash(self.write("one", b""))
+        self.assertEqual(empty, full_hash(self.write("two", b"")))
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from utils.engine import (
+    AtomicWrite,
+    Engine,
+    Exchange,
+    Hardlink,
+    Mkdir,
+    Parallel,
+    Remove,
+    Rename,
+    Result,
+    Symlink,
+)
+
+
+class TestEngine(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.base = Path(self.folder.name)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def path(self, name: str) -> str:
+        return str(self.base / name)
+
+    def test_ordered_operations(self):
+        results = Engine().run(
+            [
+                Mkdir(self.path("2023/09")),
+                AtomicWrite(self.path("IMG-1.jpg"), b"one"),
+                Rename(self.path("IMG-1.jpg"), self.path("2023/09/1.jpg")),
+                Hardlink(self.path("2023/09/1.jpg"), self.path("copy.jpg")),
+                Symlink("2023/09/1.jpg", self.path("link.jpg")),
+            ]
+        )
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual((self.base / "link.jpg").read_bytes(), b"one")
+        self.assertEqual(os.stat(self.path("copy.jpg")).st_nlink, 2)
+
+    def test_exchange(self):
+        (self.base / "first").write_text("1")
+        (self.base / "second").write_text("2")
+        Engine().run([Exchange(self.path("first"), self.path("second"))])
+        self.assertEqual((self.base / "first").read_text(), "2")
+        self.assertEqual((self.base / "second").read_text(), "1")
+
+    def test_errors(self):
+        operations = [Remove(self.path("missing")), Mkdir(self.path("folder"))]
+        results = Engine().run(operations)
+        self.assertIsInstance(results[0].error, FileNotFoundError)
+        self.assertTrue(results[1].ok)
+        self.assertEqual(len(Engine().run(operations, stop_on_error=True)), 1)
+
+    def test_parallel_keeps_order(self):
+        operations = [Mkdir(self.path(f"{x}")) for x in range(4)]
+        operations += [AtomicWrite(self.path(f"{x % 4}/{x}"), b"") for x in range(40)]
+        results = Engine(backend=Parallel()).run(operations)
+        self.assertListEqual([result.operation for result in results], operations)
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_parallel_groups_by_written_folder(self):
+        running: list[int] = []
+        lock = threading.Lock()
+
+        def execute(operation):
+            with lock:
+                running.append(running[-1] + 1 if running else 1)
+            time.sleep(0.02)
+            with lock:
+                running.append(running[-1] - 1)
+            return Result(operation)
+
+        operations = [
+            Symlink("../a/1", self.path("b/link")),
+            Hardlink(self.path("a/1"), self.path("b/copy")),
+            AtomicWrite(self.path("b/file"), b""),
+        ]
+        results = list(Parallel().run(operations, execute, False))
+        self.assertListEqual([result.operation for result in results], operations)
+        # same folder, one after another
+        self.assertEqual(max(running), 1)
+
+    def test_parallel_stops_on_error(self):
+        (self.base / "file").write_text("")
+        operations = [Mkdir(self.path("folder")), Mkdir(self.path("file/folder"))]
+        operations += [AtomicWrite(self.path("folder/x"), b"")]
+        results = Engine(backend=Parallel()).run(operations, stop_on_error=True)
+        self.assertEqual(len(results), 2)
+        self.assertFalse(results[-1].ok)
+        self.assertFalse((self.base / "folder/x").exists())
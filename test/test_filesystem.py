@@ -0,0 +1,126 @@
+import contextlib
+import errno
+import io
+import os
+import unittest
+from unittest import mock
+
+from model.rename_folder_model import Constants, RenameFolder
+from rename_items import Constant, Duplicate, FileStart, RenameItems
+from switcher import Constants as SwitcherConstants
+from switcher import Switcher
+from utils.filesystem import MemoryFileSystem
+
+
+def rename_items(fs: MemoryFileSystem, constant: Constant, **kwargs) -> str:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return repr(RenameItems(constant, FileStart, "/data", filesystem=fs, **kwargs))  # type: ignore
+
+
+class TestMemoryFileSystem(unittest.TestCase):
+    def setUp(self):
+        self.fs = MemoryFileSystem(mounts=["/ssd"])
+        self.fs.makedirs("/data")
+        self.fs.makedirs("/ssd")
+
+    def test_big_folder(self):
+        for index in range(20_000):
+            self.fs.write_bytes(f"/data/IMG-20230912-WA{index:05}.jpg", b"")
+        result: str = rename_items(self.fs, Constant(LAYOUT="date", ORDER="inode"))
+        self.assertEqual(result, "20000 elements renamed.")
+        self.assertEqual(len(self.fs.scandir("/data/2023/09")), 20_000)
+
+    def test_collisions(self):
+        self.fs.write_bytes("/data/IMG-1.jpg", b"one")
+        self.fs.write_bytes("/data/VID-1.jpg", b"two")
+        self.fs.write_bytes("/data/IMG-2.jpg", b"same")
+        self.fs.write_bytes("/data/2.jpg", b"same")
+        result: str = rename_items(self.fs, Constant(DUPLICATE=Duplicate.DELETE))
+        self.assertEqual(result, "2 elements renamed. 1 duplicates (delete).")
+        names = sorted(entry.name for entry in self.fs.scandir("/data"))
+        self.assertListEqual(names, ["1.jpg", "2.jpg", "VID-1_.jpg"])
+
+    def test_rename_order(self):
+        self.fs.write_bytes("/data/VID-1.jpg", b"two")
+        self.fs.write_bytes("/data/IMG-1.jpg", b"one")
+        rename_items(self.fs, Constant(ORDER="name"))
+        self.assertEqual(self.fs.read_bytes("/data/1.jpg"), b"one")
+        self.fs.write_bytes("/data/VID-2.jpg", b"two")
+        self.fs.write_bytes("/data/IMG-2.jpg", b"one")
+        rename_items(self.fs, Constant(ORDER="none"))
+        self.assertEqual(self.fs.read_bytes("/data/2.jpg"), b"two")
+
+    def test_duplicates_in_same_run(self):
+        self.fs.write_bytes("/data/IMG-a.jpg", b"same")
+        self.fs.write_bytes("/data/VID-a.jpg", b"same")
+        result: str = rename_items(self.fs, Constant(DUPLICATE=Duplicate.DELETE))
+        self.assertEqual(result, "1 elements renamed. 1 duplicates (delete).")
+        self.assertListEqual([x.name for x in self.fs.scandir("/data")], ["a.jpg"])
+        self.fs.write_bytes("/data/IMG-b.jpg", b"same")
+        self.fs.write_bytes("/data/VID-b.jpg", b"same")
+        result: str = rename_items(self.fs, Constant(DUPLICATE=Duplicate.HARDLINK))
+        self.assertEqual(result, "1 elements renamed. 1 duplicates (hardlink).")
+        self.assertEqual(self.fs.stat("/data/b.jpg").st_nlink, 2)
+
+    def test_cross_device_and_no_space(self):
+        self.fs.write_bytes("/data/IMG-1.jpg", b"one")
+        self.fs.write_bytes("/data/IMG-2.jpg", b"two")
+        self.fs.fail("copy", "/data/IMG-2.jpg", errno.ENOSPC)
+        result: str = rename_items(self.fs, Constant(), destination="/ssd/out")
+        self.assertEqual(result, "1 elements renamed. 1 failed.")
+        self.assertEqual(self.fs.read_bytes("/ssd/out/1.jpg"), b"one")
+        self.assertFalse(self.fs.exists("/data/IMG-1.jpg"))
+        self.assertTrue(self.fs.exists("/data/IMG-2.jpg"))
+
+    def test_source_not_removed(self):
+        self.fs.write_bytes("/data/IMG-1.jpg", b"one")
+        self.fs.write_bytes("/data/IMG-2.jpg", b"two")
+        self.fs.fail("remove", "/data/IMG-2.jpg", errno.EACCES)
+        result: str = rename_items(self.fs, Constant(), destination="/ssd/out")
+        self.assertEqual(result, "1 elements renamed. 1 failed.")
+        self.assertFalse(self.fs.exists("/data/IMG-1.jpg"))
+        self.assertTrue(self.fs.exists("/data/IMG-2.jpg"))
+        self.assertEqual(self.fs.read_bytes("/ssd/out/2.jpg"), b"two")
+
+    def test_rename_folder(self):
+        self.fs.makedirs("/data/config")
+        self.fs.write_bytes("/data/config/file", b"")
+        settings = Constants(FOLDER="config", WORKING_DIRECTORY="/data")
+        RenameFolder(settings, self.fs).rename_folder()
+        self.assertTrue(self.fs.exists("/data/config_original/file"))
+        result: str = RenameFolder(settings, self.fs).rename_folder()
+        self.assertEqual(result, "Original config active!")
+        self.assertTrue(self.fs.exists("/data/config/file"))
+
+    def test_switcher(self):
+        self.fs.makedirs("/home/user/.kube")
+        origin: str = "/home/user/.kube/config"
+        self.fs.write_bytes(origin, b"users:\n    client-key: /home/user/key")
+        settings = SwitcherConstants(HOME="SWITCHER_HOME", PROFILES=("minikube", "dev"))
+        with mock.patch.dict(os.environ, {"SWITCHER_HOME": "/home/user"}):
+            self.assertEqual(repr(Switcher(settings, self.fs)), "Success")
+            # origin changed, every config is rendered again and one write fails
+            self.fs.write_bytes(origin, b"users:\n    client-key: /home/user/new")
+            self.fs.fail("write", "/home/user/.kube/config_abs.d/.Ubuntu-dev.tmp", errno.EIO)
+            switcher = Switcher(settings._replace(PROFILE="dev"), self.fs)
+            self.assertEqual(repr(switcher), "Failed operation.")
+            self.assertDictEqual(self.fs.failures, {})
+            self.assertEqual(repr(switcher), "Success")
+        content: str = self.fs.read_bytes("/home/user/.kube/config_abs").decode()
+        self.assertIn("profiles\\dev\\client.key", content)
+
+    def test_switcher_missing_variant(self):
+        self.fs.makedirs("/home/user/.kube")
+        self.fs.write_bytes("/home/user/.kube/config", b"users:")
+        settings = SwitcherConstants(HOME="SWITCHER_HOME")
+        with mock.patch.dict(os.environ, {"SWITCHER_HOME": "/home/user"}):
+            self.assertEqual(repr(Switcher(settings, self.fs)), "Success")
+            self.fs.remove("/home/user/.kube/config_abs.d/Ubuntu-minikube")
+            self.assertEqual(repr(Switcher(settings, self.fs)), "Success")
+        self.assertTrue(self.fs.exists("/home/user/.kube/config_abs"))
+
+    def test_variant_name(self):
+        self.assertEqual(
+            Switcher.variant_name(r"\\wsl$\Ubuntu", "minikube"), "Ubuntu-minikube"
+        )
+        self.assertEqual(Switcher.variant_name("\\\\wsl$\\Debian\\", "dev"), "Debian-dev")
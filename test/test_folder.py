@@ -0,0 +1,31 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.folder import Folder
+
+
+class TestFolder(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.base = Path(self.folder.name)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_rename_between_folders(self):
+        (self.base / "source").mkdir()
+        (self.base / "source" / "IMG-1.jpg").write_text("one")
+        with Folder(str(self.base / "source")) as source, Folder(str(self.base)) as target:
+            target.makedirs("2023/09")
+            source.rename("IMG-1.jpg", target, "2023/09/1.jpg")
+            self.assertTrue(target.exists("2023/09/1.jpg"))
+            self.assertFalse(source.exists("IMG-1.jpg"))
+
+    def test_folder_moved_mid_run(self):
+        (self.base / "before").mkdir()
+        (self.base / "before" / "IMG-1.jpg").write_text("one")
+        with Folder(str(self.base / "before")) as folder:
+            (self.base / "before").rename(self.base / "after")
+            folder.rename("IMG-1.jpg", folder, "1.jpg")
+        self.assertTrue((self.base / "after" / "1.jpg").exists())
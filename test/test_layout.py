@@ -0,0 +1,31 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.layout import LAYOUTS, by_date, by_hash, flat
+
+
+class TestLayout(unittest.TestCase):
+    def test_flat(self):
+        self.assertEqual(flat(Path("IMG-20230912-WA0001.jpg")), "")
+
+    def test_date_from_name(self):
+        self.assertEqual(by_date(Path("IMG-20230912-WA0001.jpg")), "2023/09")
+        self.assertEqual(by_date(Path("/any/VID-19991201-WA0001.mp4")), "1999/12")
+
+    def test_hash_prefix(self):
+        prefix: str = by_hash(Path("IMG-20230912-WA0001.jpg"))
+        self.assertEqual(len(prefix), 2)
+        self.assertEqual(prefix, by_hash(Path("/other/IMG-20230912-WA0001.jpg")))
+
+    def test_layouts(self):
+        self.assertTupleEqual(tuple(LAYOUTS), ("flat", "date", "hash"))
+
+    def test_folder_entries(self):
+        with tempfile.TemporaryDirectory() as folder:
+            Path(folder, "IMG-1.jpg").touch()
+            with os.scandir(folder) as entries:
+                entry = next(entries)
+                self.assertEqual(len(by_date(entry)), 7)
+                self.assertEqual(by_hash(entry), by_hash(Path("IMG-1.jpg")))
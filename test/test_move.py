@@ -0,0 +1,92 @@
+import errno
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils.move import STREAM_SIZE, Mover, copy_file, split_ranges
+
+
+class TestMove(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.base = Path(self.folder.name)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_split_ranges(self):
+        self.assertListEqual(split_ranges(10, 4), [(0, 10)])
+        ranges = split_ranges(STREAM_SIZE * 2 + 1, 4)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(sum(length for _, length in ranges), STREAM_SIZE * 2 + 1)
+
+    def test_copy_file_keeps_metadata(self):
+        source: Path = self.base / "source"
+        source.write_bytes(b"content")
+        os.utime(source, (1_000_000, 1_000_000))
+        copy_file(str(source), str(self.base / "copy"))
+        self.assertEqual((self.base / "copy").read_bytes(), b"content")
+        self.assertEqual((self.base / "copy").stat().st_mtime, 1_000_000)
+
+    def test_failed_copy_leaves_no_file(self):
+        source: Path = self.base / "source"
+        source.write_bytes(b"content")
+        full = OSError(errno.ENOSPC, "No space left on device")
+        with mock.patch("utils.move._transfer", side_effect=full):
+            with self.assertRaises(OSError):
+                copy_file(str(source), str(self.base / "copy"))
+        self.assertListEqual(os.listdir(self.base), ["source"])
+
+    def test_move_across_filesystems(self):
+        source: Path = self.base / "source"
+        source.write_bytes(b"content")
+        cross = OSError(errno.EXDEV, "Invalid cross-device link")
+        with mock.patch("utils.move.os.rename", side_effect=cross):
+            with Mover() as mover:
+                mover.move(str(source), str(self.base / "destination"))
+                self.assertTrue(source.exists())
+        self.assertFalse(source.exists())
+        self.assertEqual((self.base / "destination").read_bytes(), b"content")
+
+    def test_move_folder_across_filesystems(self):
+        source: Path = self.base / "source"
+        (source / "nested").mkdir(parents=True)
+        (source / "nested" / "file").write_bytes(b"content")
+        destination: str = str(self.base / "destination")
+        cross = OSError(errno.EXDEV, "Invalid cross-device link")
+        with mock.patch("utils.move.os.rename", side_effect=cross):
+            mover = Mover()
+            mover.move(str(source), destination)
+            # copy changed before it was verified, source must survive
+            Path(destination, "nested", "file").write_bytes(b"changed")
+            with mock.patch("utils.move.sync") as sync:
+                failures = mover.flush()
+            sync.assert_any_call(f"{destination}/nested/file")
+        self.assertListEqual([source for source, _ in failures], [str(source)])
+        self.assertEqual((source / "nested" / "file").read_bytes(), b"content")
+        self.assertFalse(os.path.exists(destination))
+
+    def test_source_not_removed(self):
+        sources: list[Path] = [self.base / f"source{number}" for number in range(3)]
+        for source in sources:
+            source.write_bytes(b"content")
+        denied = PermissionError(errno.EACCES, "Permission denied")
+        cross = OSError(errno.EXDEV, "Invalid cross-device link")
+        remove = os.remove
+
+        def remove_or_deny(path: str) -> None:
+            if path == str(sources[1]):
+                raise denied
+            remove(path)
+
+        mover = Mover(batch=2)
+        with mock.patch("utils.move.os.rename", side_effect=cross):
+            with mock.patch("utils.move.os.remove", side_effect=remove_or_deny):
+                for number, source in enumerate(sources):
+                    mover.move(str(source), str(self.base / f"copy{number}"))
+                failures = mover.flush()
+        self.assertListEqual(failures, [(str(sources[1]), denied)])
+        self.assertListEqual([source.exists() for source in sources], [False, True, False])
+        self.assertTrue((self.base / "copy1").exists())
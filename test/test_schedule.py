@@ -0,0 +1,23 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils.schedule import ORDERS, by_inode
+
+
+class TestSchedule(unittest.TestCase):
+    def test_orders(self):
+        self.assertIsNone(ORDERS["none"])
+        self.assertIs(ORDERS["inode"], by_inode)
+
+    def test_inode_order(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ("c", "a", "b"):
+                Path(folder, name).touch()
+            with mock.patch("os.DirEntry.stat") as stat, os.scandir(folder) as entries:
+                ordered: list[os.DirEntry] = sorted(entries, key=by_inode)
+                stat.assert_not_called()
+            inodes: list[int] = [os.lstat(file.path).st_ino for file in ordered]
+            self.assertListEqual(inodes, sorted(inodes))
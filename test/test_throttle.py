@@ -0,0 +1,38 @@
+import time
+import unittest
+
+from utils.throttle import MIN_RATE, Throttle
+
+
+class TestThrottle(unittest.TestCase):
+    def test_no_limit(self):
+        throttle = Throttle()
+        throttle.record(10)
+        self.assertEqual(throttle.rate, 0)
+
+    def test_rate_limit(self):
+        throttle = Throttle(ops_per_second=200)
+        start: float = time.monotonic()
+        for _ in range(5):
+            with throttle:
+                pass
+        self.assertGreaterEqual(time.monotonic() - start, 4 / 200)
+
+    def test_backoff_and_recover(self):
+        throttle = Throttle(ops_per_second=100, latency=0.01)
+        for _ in range(5):
+            throttle.record(1)
+        self.assertLess(throttle.rate, 100)
+        self.assertGreaterEqual(throttle.rate, MIN_RATE)
+        for _ in range(500):
+            throttle.record(0)
+        self.assertEqual(throttle.rate, 100)
+
+    def test_short_spike(self):
+        throttle = Throttle(ops_per_second=100, latency=0.01)
+        for _ in range(3):
+            throttle.record(1)
+        self.assertEqual(throttle.rate, 50)
+        for _ in range(40):
+            throttle.record(0)
+        self.assertEqual(throttle.rate, 100)